@@ -10,7 +10,7 @@ from guardify import *
 
 # Import webhood utilities
 from webhood.router import WebSocket, router
-from webhood.database import wait_for_redis_sync, broadcast_async, receive_async, redict
+from webhood.database import wait_for_redis_sync, broadcast_async, receive_async, redict, aredict
 from webhood.constants import LOG_LEVEL, LOG_FORMAT, LOG_DATEFORMAT
 
 # Setup logging
@@ -19,6 +19,9 @@ logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, datefmt=LOG_DATEFORMAT)
 # Global database
 DATABASE = redict("click")
 
+# Global database for async routes
+ASYNC_DATABASE = aredict("click")
+
 
 def startup() -> None:
     # Wait for redis to ping back before operating on database
@@ -46,19 +49,19 @@ async def worker() -> None:
 @router.get("/api/clicks")
 async def fetch_clicks() -> int:
     # Return the count from the database
-    return DATABASE.count
+    return await ASYNC_DATABASE.fetch("count")
 
 
 @router.post("/api/clicks")
 async def click_request() -> str:
     # Increment ping count
-    DATABASE.count += 1
+    count = await ASYNC_DATABASE.increment("count")
 
     # Log the user click
-    logging.info("User clicked - count is now %d", DATABASE.count)
+    logging.info("User clicked - count is now %d", count)
 
     # Return the ping count
-    return f"Click count is {DATABASE.count}"
+    return f"Click count is {count}"
 
 
 @router.post("/api/relay")
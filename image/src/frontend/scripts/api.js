@@ -56,7 +56,7 @@ async function upload(action, parameters = {}) {
 	return await response.json();
 }
 
-function socket(action, callback) {
+function socket(action, callback, reconnect = true) {
 	// Create websocket object using current location
 	const object = new WebSocket((window.location.protocol === "https:" ? "wss://" : "ws://") + window.location.host + action);
 
@@ -66,6 +66,15 @@ function socket(action, callback) {
 		await callback(event.data, object);
 	};
 
+	// Add the on-close event listener
+	object.onclose = (event) => {
+		// Make sure the server asked to reconnect (service restart)
+		if (!reconnect || event.code !== 1012) return;
+
+		// Reconnect after a random delay within the window sent by the server, so that clients do not reconnect all at once
+		setTimeout(() => socket(action, callback, reconnect), Math.random() * (parseInt(event.reason) || 5000));
+	};
+
 	// Return the object
 	return object;
 }
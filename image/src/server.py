@@ -3,15 +3,21 @@
 
 import os
 import sys
+import math
+import time
+import random
+import typing
 import asyncio
 import inspect
 import logging
 import argparse
 import contextlib
+import multiprocessing
 
 # Import uvicorn
 import uvicorn
 import uvicorn.config
+import uvicorn.supervisors.multiprocess
 
 # Append the current directory to the Python PATH
 sys.path.append(os.getcwd())
@@ -19,6 +25,219 @@ sys.path.append(os.getcwd())
 # Import logging formats
 from webhood.constants import LOG_LEVEL, LOG_FORMAT, LOG_DATEFORMAT
 
+# Import compression configuration
+from webhood.compression import WEBSOCKET_COMPRESSION
+
+# Import socket draining utilities
+from webhood.router import DRAINER
+
+# Maximal time for in-flight requests to finish once sockets are drained, before they are cancelled
+SHUTDOWN_TIMEOUT = float(os.environ.get("SHUTDOWN_TIMEOUT", 30))
+
+# Maximal time to wait for a replacement worker to start before stopping the worker it replaces
+RESTART_TIMEOUT = float(os.environ.get("RESTART_TIMEOUT", 60))
+
+# Number of workers - 0 sizes the workers by the available CPUs
+WORKERS = int(os.environ.get("WORKERS", 0))
+
+# Maximal number of pending connections in the listen queue
+SERVER_BACKLOG = int(os.environ.get("SERVER_BACKLOG", 2048))
+
+# Time to keep idle connections open for additional requests
+SERVER_KEEP_ALIVE = int(os.environ.get("SERVER_KEEP_ALIVE", 5))
+
+# Maximal number of concurrent connections and tasks per worker, before responding with 503 - 0 disables the limit
+SERVER_CONCURRENCY = int(os.environ.get("SERVER_CONCURRENCY", 0))
+
+# Number of requests after which a worker is recycled, randomized per worker so that workers are not recycled together - 0 disables recycling
+SERVER_MAX_REQUESTS = int(os.environ.get("SERVER_MAX_REQUESTS", 0))
+SERVER_MAX_REQUESTS_JITTER = int(os.environ.get("SERVER_MAX_REQUESTS_JITTER", 0))
+
+# Paths of the CPU quota files for cgroup v2 and v1
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def cpu_quota() -> typing.Optional[float]:
+    try:
+        # Read the quota and the period (cgroup v2), where the quota might be "max"
+        with open(CGROUP_CPU_MAX, "r") as file:
+            quota, period = file.read().split()
+
+        # Return the quota in CPUs, unless unlimited
+        return int(quota) / int(period) if quota != "max" else None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # Read the quota and the period (cgroup v1), where a negative quota is unlimited
+        with open(CGROUP_CPU_QUOTA, "r") as quota_file, open(CGROUP_CPU_PERIOD, "r") as period_file:
+            quota, period = int(quota_file.read()), int(period_file.read())
+
+        # Return the quota in CPUs, unless unlimited
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_count() -> int:
+    # Count the CPUs this process may run on
+    count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+    # Limit the count using the CPU quota, rounding partial CPUs up
+    quota = cpu_quota()
+    if quota is not None:
+        count = min(count, math.ceil(quota))
+
+    # Return at least a single CPU
+    return max(count, 1)
+
+
+class Server(uvicorn.Server):
+
+    def __init__(self, config: uvicorn.Config, ready: typing.Optional[typing.Any] = None) -> None:
+        # Initialize the server
+        super().__init__(config)
+
+        # Store the event that is set once the server is serving
+        self.ready = ready
+
+    async def serve(self, sockets=None) -> None:
+        # Randomize the number of requests before recycling this worker
+        if self.config.limit_max_requests:
+            self.config.limit_max_requests += random.randint(0, SERVER_MAX_REQUESTS_JITTER)
+
+        # Serve the application
+        await super().serve(sockets)
+
+    async def startup(self, sockets=None) -> None:
+        # Start the server
+        await super().startup(sockets)
+
+        # Notify the supervisor that the server is serving
+        if self.started and self.ready is not None:
+            self.ready.set()
+
+    async def shutdown(self, sockets=None) -> None:
+        # Stop accepting new connections, so that new clients reach other workers
+        for server in self.servers:
+            server.close()
+        for sock in sockets or []:
+            sock.close()
+
+        # Let open sockets finish, closing the rest with a reconnect code within the drain window
+        await DRAINER.drain()
+
+        # Wait for in-flight requests and shut down the application
+        await super().shutdown(sockets)
+
+
+class Supervisor(uvicorn.supervisors.multiprocess.Multiprocess):
+
+    def __init__(self, *arguments: typing.Any, **keywords: typing.Any) -> None:
+        # Initialize the supervisor
+        super().__init__(*arguments, **keywords)
+
+        # Initialize the indices of the workers that are waiting to be replaced
+        self.rolling: typing.List[int] = []
+
+        # Initialize the replacement worker that is starting, with its readiness event and deadline
+        self.replacement: typing.Optional[typing.Tuple[uvicorn.supervisors.multiprocess.Process, typing.Any, float]] = None
+
+        # Initialize the replaced workers that are still draining
+        self.stopping: typing.List[uvicorn.supervisors.multiprocess.Process] = []
+
+    def restart_all(self) -> None:
+        # Schedule the replacement of all workers - the roll advances from the main loop, so that signals and dead workers are still handled meanwhile
+        self.rolling = list(range(len(self.processes)))
+
+    def roll(self) -> None:
+        # Collect the replaced workers that finished draining
+        for process in list(self.stopping):
+            if not process.process.is_alive():
+                process.join()
+                self.stopping.remove(process)
+
+        if self.replacement is None:
+            # Replace one worker at a time, once the previously replaced worker finished draining
+            if not self.rolling or self.stopping:
+                return
+
+            # Create the readiness event of the replacement worker
+            ready = multiprocessing.get_context("spawn").Event()
+
+            # Start the replacement worker
+            replacement = uvicorn.supervisors.multiprocess.Process(self.config, Server(self.config, ready).run, self.sockets)
+            replacement.start()
+
+            # Store the replacement worker
+            self.replacement = (replacement, ready, time.monotonic() + RESTART_TIMEOUT)
+            return
+
+        # Unpack the replacement worker
+        replacement, ready, deadline = self.replacement
+
+        if not ready.is_set():
+            # Keep waiting for the replacement worker to serve
+            if replacement.process.is_alive() and time.monotonic() < deadline:
+                return
+
+            # Stop the replacement worker and keep the old workers running
+            logging.warning("Worker [%d] did not start in time, keeping the old workers", replacement.pid)
+            self.abort()
+            return
+
+        # Take the next worker to replace
+        index = self.rolling.pop(0)
+        self.replacement = None
+
+        # Stop the replacement worker if the number of workers was decreased meanwhile
+        if index >= len(self.processes):
+            replacement.terminate()
+            self.stopping.append(replacement)
+            return
+
+        # Stop the old worker, which drains its sockets, and store the replacement worker
+        self.processes[index].terminate()
+        self.stopping.append(self.processes[index])
+        self.processes[index] = replacement
+
+    def abort(self) -> None:
+        # Cancel the rest of the roll
+        self.rolling = []
+
+        # Stop the replacement worker
+        if self.replacement is not None:
+            replacement, _, _ = self.replacement
+            replacement.terminate()
+            replacement.kill()
+            replacement.join()
+            self.replacement = None
+
+    def run(self) -> None:
+        # Start the workers
+        logging.info("Started parent process [%d]", os.getpid())
+        self.init_processes()
+
+        # Handle signals, replace dead workers and advance the roll until shutdown
+        while not self.should_exit.wait(0.5):
+            self.handle_signals()
+            self.keep_subprocess_alive()
+            self.roll()
+
+        # Cancel the roll on shutdown
+        self.abort()
+
+        # Stop all workers, including the replaced workers that are still draining
+        self.terminate_all()
+        self.join_all()
+        for process in self.stopping:
+            process.join()
+
+        # Log the shutdown
+        logging.info("Stopping parent process [%d]", os.getpid())
+
 
 def main():
     # Setup logging
@@ -26,7 +245,7 @@ def main():
 
     # Create argument parser to parse arguments
     parser = argparse.ArgumentParser()
-    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=WORKERS or cpu_count())
 
     # Parse the arguments
     arguments = parser.parse_args()
@@ -47,8 +266,8 @@ def main():
         uvicorn.config.LOGGING_CONFIG["formatters"]["default"]["fmt"] = uvicorn.config.LOGGING_CONFIG["formatters"]["access"]["fmt"] = LOG_FORMAT
         uvicorn.config.LOGGING_CONFIG["formatters"]["default"]["datefmt"] = uvicorn.config.LOGGING_CONFIG["formatters"]["access"]["datefmt"] = LOG_DATEFORMAT
 
-        # Run the application using uvicorn
-        uvicorn.run(
+        # Create the application configuration
+        config = uvicorn.Config(
             app="app:router",
             factory=True,
             # Host and port to bind
@@ -61,9 +280,32 @@ def main():
             # Disable Date and Server headers
             date_header=False,
             server_header=False,
+            # Negotiate socket compression
+            ws_per_message_deflate=WEBSOCKET_COMPRESSION,
+            # Cancel requests that do not finish in time on shutdown
+            timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+            # Prefer the uvloop event loop and the httptools parser when installed
+            loop="auto",
+            http="auto",
+            # Connection limits
+            backlog=SERVER_BACKLOG,
+            timeout_keep_alive=SERVER_KEEP_ALIVE,
+            limit_concurrency=SERVER_CONCURRENCY or None,
+            # Recycle workers after a number of requests
+            limit_max_requests=SERVER_MAX_REQUESTS or None,
             # Number of workers
             workers=arguments.workers,
         )
+
+        # Log the server configuration
+        logging.info("Starting %d workers", config.workers)
+
+        if config.workers == 1 and not config.limit_max_requests:
+            # Run a single worker in this process, since there is nothing to supervise
+            Server(config).run()
+        else:
+            # Run the workers using the supervisor, which replaces them one at a time on SIGHUP and restarts recycled workers
+            Supervisor(config, target=Server(config).run, sockets=[config.bind_socket()]).run()
     finally:
         # Execute the shutdown function
         with contextlib.suppress(ImportError):
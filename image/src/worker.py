@@ -3,9 +3,12 @@
 
 import os
 import sys
+import signal
+import typing
 import asyncio
 import inspect
 import logging
+import threading
 import contextlib
 
 # Append the current directory to the Python PATH
@@ -14,42 +17,99 @@ sys.path.append(os.getcwd())
 # Import logging formats
 from webhood.constants import LOG_LEVEL, LOG_FORMAT, LOG_DATEFORMAT
 
+# Import hook utilities
+from webhood.router import call_hook
 
-def main():
-    # Setup logging
-    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, datefmt=LOG_DATEFORMAT)
+# Import task utilities
+from webhood.tasks import TASK_SHUTDOWN_TIMEOUT, scheduler
+
+
+async def run_in_thread(function: typing.Callable[[], typing.Any]) -> None:
+    # Create the future of the function
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def target() -> None:
+        try:
+            # Call the function and resolve the future
+            result = function()
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+        except BaseException as exception:  # pylint: disable=broad-exception-caught
+            # Fail the future
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_exception(exception))
+
+    # Run the function in a daemon thread, which does not keep the worker alive once stopped
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+
+    try:
+        # Wait for the function to return
+        await future
+    finally:
+        # Give the function time to return when the worker stops, so that the shutdown function does not run alongside it
+        if thread.is_alive():
+            await loop.run_in_executor(None, thread.join, TASK_SHUTDOWN_TIMEOUT)
+
+        # Leave the function running if it did not return in time
+        if thread.is_alive():
+            logging.warning("The worker function did not return within %s seconds", TASK_SHUTDOWN_TIMEOUT)
+
+
+async def run() -> None:
+    # Stop gracefully when interrupted or terminated
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(signal_number, asyncio.current_task().cancel)
+
+    # Import the application, which registers the scheduled tasks
+    import app  # pylint: disable=unused-import
 
-    # Execute the startup function
+    # Execute the startup function, in the same event loop as the worker so that async resources can be shared
     with contextlib.suppress(ImportError):
         # Import the startup function
         from app import startup
 
-        # If the function is a coroutine, execute using asyncio
-        if inspect.iscoroutinefunction(startup):
-            asyncio.run(startup())
-        else:
-            startup()
+        # Call the function, awaiting coroutines
+        await call_hook(startup)
 
-    try:
+    # Initialize the functions to run concurrently
+    functions = []
+
+    # Run the worker function if implemented
+    with contextlib.suppress(ImportError):
         # Import the worker function
         from app import worker
 
-        # If the function is a coroutine, execute using asyncio
-        if inspect.iscoroutinefunction(worker):
-            asyncio.run(worker())
-        else:
-            worker()
+        # Run synchronous functions in a thread, so that they do not block the scheduled tasks
+        functions.append(worker() if inspect.iscoroutinefunction(worker) else run_in_thread(worker))
+
+    # Run the scheduled tasks if registered
+    if scheduler.tasks:
+        functions.append(scheduler.run())
+
+    # Make sure there is something to run
+    if not functions:
+        logging.warning("No worker function or scheduled tasks are defined")
+
+    try:
+        # Run the functions concurrently
+        await asyncio.gather(*functions)
     finally:
         # Execute the shutdown function
         with contextlib.suppress(ImportError):
             # Import the shutdown function
             from app import shutdown
 
-            # If the function is a coroutine, execute using asyncio
-            if inspect.iscoroutinefunction(shutdown):
-                asyncio.run(shutdown())
-            else:
-                shutdown()
+            # Call the function, awaiting coroutines
+            await call_hook(shutdown)
+
+
+def main():
+    # Setup logging
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, datefmt=LOG_DATEFORMAT)
+
+    # Run the functions using asyncio, until stopped
+    with contextlib.suppress(asyncio.CancelledError):
+        asyncio.run(run())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,429 @@
+import os
+import time
+import queue
+import typing
+import logging
+import weakref
+import functools
+import threading
+import collections
+
+# Import redis utilities
+import redis
+
+# Import rednest utilities
+from rednest import List
+
+# Import nested utilities
+from webhood.nested import AtomicDictionary
+
+# Import metrics utilities
+from webhood.metrics import COLLECTORS, CACHE_LOOKUPS
+
+# Keyspace notification flags required for invalidation - keyspace, generic, hash, list, expired and evicted events
+KEYSPACE_FLAGS = "Kghlxe"
+
+# Whether to add the required keyspace notification flags to the server configuration - otherwise they must be configured on the server
+CACHE_CONFIGURE_NOTIFICATIONS = bool(int(os.environ.get("CACHE_CONFIGURE_NOTIFICATIONS", 0)))
+
+# Maximal time the subscriber thread blocks for messages - new subscriptions wake it up through its own channel
+CACHE_WAIT_TIMEOUT = 10
+
+# Sentinel for missing cache entries
+MISSING = object()
+
+# Cache key of list lengths
+LENGTH = object()
+
+
+class Cache:
+
+    def __init__(self, ttl: float = 1, size: int = 1024, channel: typing.Optional[str] = None, connection: typing.Optional[redis.Redis] = None) -> None:
+        # Store the cache configuration
+        self.ttl = ttl
+        self.size = size
+
+        # Store the invalidation channel and its connection
+        self.channel = channel
+        self.connection = connection
+
+        # Initialize the entries, ordered from least to most recently used
+        self.entries: typing.OrderedDict[typing.Any, typing.Tuple[float, typing.Any]] = collections.OrderedDict()
+
+        # Initialize the lock, since caches might be used from multiple threads
+        self.lock = threading.Lock()
+
+        # Initialize the generation - bumped on every invalidation
+        self.generation = 0
+
+        # Initialize the counters
+        self.hits = 0
+        self.misses = 0
+
+        # Register the cache for metrics collection
+        CACHES.add(self)
+
+    def get(self, key: typing.Any) -> typing.Any:
+        # Make sure the cache is invalidated on channel messages
+        if self.channel is not None and self.connection is not None:
+            fetch_invalidator(self.connection).listen(self.channel, self)
+
+        with self.lock:
+            # Fetch the entry
+            entry = self.entries.get(key)
+
+            # Check whether the entry exists and is fresh
+            if entry is None or entry[0] < time.monotonic():
+                # Drop the expired entry
+                self.entries.pop(key, None)
+
+                # Count the miss
+                self.misses += 1
+
+                # Entry is missing
+                return MISSING
+
+            # Mark the entry as recently used
+            self.entries.move_to_end(key)
+
+            # Count the hit
+            self.hits += 1
+
+            # Return the cached value
+            return entry[1]
+
+    def set(self, key: typing.Any, value: typing.Any, generation: int) -> None:
+        with self.lock:
+            # Skip values that were fetched before the last invalidation
+            if generation != self.generation:
+                return
+
+            # Store the entry with its expiration time
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+
+            # Evict the least recently used entries
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self.lock:
+            # Clear all entries
+            self.entries.clear()
+
+            # Bump the generation so that in-flight fetches are not stored
+            self.generation += 1
+
+
+# Caches of this process, for metrics collection
+CACHES: "weakref.WeakSet[Cache]" = weakref.WeakSet()
+
+
+def collect_caches() -> None:
+    # Update the lookup metrics of all caches
+    CACHE_LOOKUPS.set("hit", value=sum(cache.hits for cache in list(CACHES)))
+    CACHE_LOOKUPS.set("miss", value=sum(cache.misses for cache in list(CACHES)))
+
+
+# Collect the lookup metrics of all caches
+COLLECTORS.append(collect_caches)
+
+
+class Invalidator:
+
+    def __init__(self, connection: redis.Redis) -> None:
+        # Store the redis connection
+        self.connection = connection
+
+        # Store the process that owns the subscriber
+        self.pid = os.getpid()
+
+        # Fetch the database index for keyspace channels
+        self.database = connection.connection_pool.connection_kwargs.get("db", 0)
+
+        # Initialize the caches of every key and of every channel
+        self.caches: typing.Dict[str, typing.List[Cache]] = {}
+        self.channels: typing.Dict[str, typing.List[Cache]] = {}
+
+        # Create the keyspace subscriber - it is only used by the subscriber thread, since subscribers are not thread-safe
+        self.subscriber = connection.pubsub(ignore_subscribe_messages=True)
+        self.thread: typing.Optional[threading.Thread] = None
+
+        # Create the channel that wakes the subscriber thread up when subscriptions are added
+        self.wakeup = f"invalidator:{os.urandom(8).hex()}"
+
+        # Initialize the subscriptions waiting for the subscriber thread, with the invalidations that follow them
+        self.pending: "queue.Queue[typing.Tuple[typing.Callable[[], typing.Any], typing.Callable[[], typing.Any]]]" = queue.Queue()
+
+        # Initialize the lock that guards the registered caches and the subscriber thread
+        self.lock = threading.Lock()
+
+    def enable(self) -> None:
+        try:
+            # Fetch the current notification flags
+            flags = self.connection.config_get("notify-keyspace-events").get("notify-keyspace-events", "")
+
+            # Expand the "all" alias
+            expanded_flags = flags.replace("A", "g$lshzxet")
+
+            # Nothing to do if all flags are enabled
+            if set(KEYSPACE_FLAGS).issubset(expanded_flags):
+                return
+
+            # Add the missing flags to the current flags if allowed
+            if CACHE_CONFIGURE_NOTIFICATIONS:
+                self.connection.config_set("notify-keyspace-events", flags + "".join(flag for flag in KEYSPACE_FLAGS if flag not in expanded_flags))
+            else:
+                logging.warning("Keyspace notifications %r are not enabled on the server, near caches rely on TTL only", KEYSPACE_FLAGS)
+        except redis.RedisError as exception:
+            # Configuration might not be allowed, caches will rely on their TTL
+            logging.warning("Failed enabling keyspace notifications, near caches rely on TTL only: %r", exception)
+
+    def subscribe(self, function: typing.Callable[[], typing.Any], invalidate: typing.Callable[[], typing.Any]) -> None:
+        # Queue the subscription for the subscriber thread - caches are invalidated once it is applied, so values cached before then are not kept
+        self.pending.put((function, invalidate))
+
+        # Start listening in the background
+        self.start()
+
+        # Wake the subscriber thread up without waiting for the subscription, since this might run on the event loop
+        try:
+            self.connection.publish(self.wakeup, "")
+        except redis.RedisError as exception:
+            # The subscriber thread applies the subscription once it wakes up on its own
+            logging.warning("Failed waking the near cache invalidator: %r", exception)
+
+    def register(self, key: str, cache: Cache) -> None:
+        with self.lock:
+            # Check whether the cache is already registered
+            if cache in self.caches.get(key, ()):
+                return
+
+            # Check whether the key is already subscribed
+            subscribed = key in self.caches
+
+            # Register the cache
+            self.caches.setdefault(key, []).append(cache)
+
+        # Subscribe to changes of the key and of its nested keys as needed
+        if not subscribed:
+            # Create the invalidation handler
+            handler = functools.partial(self.invalidate, key)
+
+            # Subscribe to the keyspace channels
+            self.subscribe(functools.partial(self.subscriber.psubscribe, **{f"__keyspace@{self.database}__:{key}": handler, f"__keyspace@{self.database}__:{key}:*": handler}), handler)
+
+    def listen(self, channel: str, cache: Cache) -> None:
+        with self.lock:
+            # Check whether the cache is already registered
+            if cache in self.channels.get(channel, ()):
+                return
+
+            # Check whether the channel is already subscribed
+            subscribed = channel in self.channels
+
+            # Register the cache
+            self.channels.setdefault(channel, []).append(cache)
+
+        # Subscribe to the channel as needed
+        if not subscribed:
+            # Create the invalidation handler
+            handler = functools.partial(self.flush, channel)
+
+            # Subscribe to the channel
+            self.subscribe(functools.partial(self.subscriber.subscribe, **{channel: handler}), handler)
+
+    def start(self) -> None:
+        with self.lock:
+            # Start the subscriber thread as needed
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="invalidator", daemon=True)
+                self.thread.start()
+
+    def apply(self) -> None:
+        # Apply the pending subscriptions
+        while not self.pending.empty():
+            function, invalidate = self.pending.get_nowait()
+            try:
+                function()
+            finally:
+                invalidate()
+
+    def run(self) -> None:
+        # Check the keyspace notification flags, off the event loop
+        self.enable()
+
+        while True:
+            try:
+                # Subscribe to the wakeup channel, the subscriber resubscribes by itself after reconnecting
+                if not self.subscriber.subscribed:
+                    self.subscriber.subscribe(self.wakeup)
+
+                # Apply the pending subscriptions
+                self.apply()
+
+                # Block until the next message, invalidation messages are handled by their handlers
+                self.subscriber.get_message(timeout=CACHE_WAIT_TIMEOUT)
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                # Handle the failure and wait before reconnecting
+                self.failed(exception)
+                time.sleep(1)
+
+    def invalidate(self, key: str, message: typing.Any = None) -> None:
+        # Invalidate all caches of the key
+        for cache in list(self.caches.get(key, ())):
+            cache.invalidate()
+
+    def flush(self, channel: str, message: typing.Any = None) -> None:
+        # Invalidate all caches of the channel
+        for cache in list(self.channels.get(channel, ())):
+            cache.invalidate()
+
+    def failed(self, exception: BaseException) -> None:
+        # Log the failure
+        logging.error("Near cache invalidation failed: %r", exception)
+
+        # Invalidate all caches, since notifications might have been missed - the subscriber reconnects on the next read
+        for key in list(self.caches):
+            self.invalidate(key)
+        for channel in list(self.channels):
+            self.flush(channel)
+
+
+# Invalidators of this process
+INVALIDATORS: typing.Dict[redis.Redis, Invalidator] = {}
+
+
+def fetch_invalidator(connection: redis.Redis) -> Invalidator:
+    # Fetch the current invalidator of the connection
+    invalidator = INVALIDATORS.get(connection)
+
+    # Create a new invalidator if none exists or if the process was forked
+    if invalidator is None or invalidator.pid != os.getpid():
+        invalidator = INVALIDATORS[connection] = Invalidator(connection)
+
+    # Return the invalidator
+    return invalidator
+
+
+def invalidating(function: typing.Callable[..., typing.Any]) -> typing.Callable[..., typing.Any]:
+
+    @functools.wraps(function)
+    def wrapper(self: typing.Any, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        try:
+            # Call the mutating function
+            return function(self, *args, **kwargs)
+        finally:
+            # Invalidate the local cache so that the writer reads its own writes
+            self._cache.invalidate()
+
+    # Return the wrapper
+    return wrapper
+
+
+class CachedDictionary(AtomicDictionary):
+
+    # Near cache of the dictionary
+    _cache: Cache = None  # type: ignore
+
+    def __init__(self, connection: redis.Redis, key: str, master: typing.Optional[str] = None, cache: typing.Optional[Cache] = None) -> None:
+        # Initialize the dictionary
+        super().__init__(connection, key, master)
+
+        # Store the near cache
+        self._cache = cache or Cache()
+
+    def __getitem__(self, key: typing.Any) -> typing.Any:
+        # Make sure the cache is invalidated on remote changes
+        fetch_invalidator(self._connection).register(self._key, self._cache)
+
+        # Try fetching the value from the cache - entries are keyed by the database key too, since caches may be shared
+        value = self._cache.get((self._key, key))
+
+        # Return cached values
+        if value is not MISSING:
+            return value
+
+        # Store the generation before fetching
+        generation = self._cache.generation
+
+        # Fetch the value from the database
+        value = super().__getitem__(key)
+
+        # Store the value in the cache
+        self._cache.set((self._key, key), value, generation)
+
+        # Return the value
+        return value
+
+    # Mutating functions invalidate the cache
+    __delitem__ = invalidating(AtomicDictionary.__delitem__)
+    update = invalidating(AtomicDictionary.update)
+    clear = invalidating(AtomicDictionary.clear)
+    setdefault = invalidating(AtomicDictionary.setdefault)
+    increment = invalidating(AtomicDictionary.increment)
+    set_if_absent = invalidating(AtomicDictionary.set_if_absent)
+    compare_and_swap = invalidating(AtomicDictionary.compare_and_swap)
+    append = invalidating(AtomicDictionary.append)
+
+
+class CachedList(List):
+
+    # Near cache of the list
+    _cache: Cache = None  # type: ignore
+
+    def __init__(self, connection: redis.Redis, key: str, master: typing.Optional[str] = None, cache: typing.Optional[Cache] = None) -> None:
+        # Initialize the list
+        super().__init__(connection, key, master)
+
+        # Store the near cache
+        self._cache = cache or Cache()
+
+    def _cached(self, key: typing.Any, fetch: typing.Callable[[], typing.Any]) -> typing.Any:
+        # Make sure the cache is invalidated on remote changes
+        fetch_invalidator(self._connection).register(self._key, self._cache)
+
+        # Try fetching the value from the cache - entries are keyed by the database key too, since caches may be shared
+        value = self._cache.get((self._key, key))
+
+        # Return cached values
+        if value is not MISSING:
+            return value
+
+        # Store the generation before fetching
+        generation = self._cache.generation
+
+        # Fetch the value from the database
+        value = fetch()
+
+        # Store the value in the cache
+        self._cache.set((self._key, key), value, generation)
+
+        # Return the value
+        return value
+
+    def __getitem__(self, index: typing.Union[int, slice]) -> typing.Any:
+        # Slices are built from single items
+        if isinstance(index, slice):
+            return super().__getitem__(index)
+
+        # Normalize negative indices
+        if index < 0:
+            index += len(self)
+
+        # Fetch the item through the cache
+        return self._cached(index, lambda: super(CachedList, self).__getitem__(index))
+
+    def __len__(self) -> int:
+        # Fetch the length through the cache
+        return self._cached(LENGTH, super().__len__)
+
+    # Mutating functions invalidate the cache
+    __setitem__ = invalidating(List.__setitem__)
+    __delitem__ = invalidating(List.__delitem__)
+    insert = invalidating(List.insert)
+    clear = invalidating(List.clear)
+
+
+# Add explicit exports
+__all__ = ["Cache", "CachedDictionary", "CachedList", "fetch_invalidator"]
@@ -0,0 +1,163 @@
+import os
+import json
+import typing
+import contextlib
+
+# Import abstract types
+from collections.abc import Mapping, Sequence
+
+# Import optional codec libraries
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # type: ignore[assignment]
+
+# Mime-types for codecs
+MIMETYPE_JSON = "application/json"
+MIMETYPE_MSGPACK = "application/msgpack"
+
+# Prefix of tagged messages - JSON messages are never tagged, so that older readers can still parse them
+TAG_PREFIX = b"\x00"
+
+
+def copy_nested(value: typing.Any) -> typing.Any:
+    # Check if the object is a keystore
+    if isinstance(value, (Mapping, Sequence)):
+        # Try copying the value
+        with contextlib.suppress(AttributeError):
+            return value.copy()  # type: ignore[union-attr]
+
+    # Value cannot be encoded
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+class Codec:
+
+    # Codec name, used for selection
+    name: str = ""
+
+    # Message format tag
+    tag: bytes = b""
+
+    # Response media type
+    media_type: str = MIMETYPE_JSON
+
+    def dumps(self, value: typing.Any) -> bytes:
+        raise NotImplementedError()
+
+    def loads(self, data: bytes) -> typing.Any:
+        raise NotImplementedError()
+
+
+class JSONCodec(Codec):
+
+    # Codec name
+    name = "json"
+
+    def dumps(self, value: typing.Any) -> bytes:
+        # Dump the value using the standard library
+        return json.dumps(value, default=copy_nested, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> typing.Any:
+        # Load the value using the standard library
+        return json.loads(data)
+
+
+class ORJSONCodec(JSONCodec):
+
+    # Codec name
+    name = "orjson"
+
+    def dumps(self, value: typing.Any) -> bytes:
+        # Dump the value using orjson
+        return orjson.dumps(value, default=copy_nested)
+
+    def loads(self, data: bytes) -> typing.Any:
+        # Load the value using orjson
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+
+    # Codec name
+    name = "msgpack"
+
+    # Message format tag - version 1
+    tag = TAG_PREFIX + b"M1"
+
+    # Response media type
+    media_type = MIMETYPE_MSGPACK
+
+    def dumps(self, value: typing.Any) -> bytes:
+        # Dump the value using msgpack
+        return msgpack.packb(value, default=copy_nested)
+
+    def loads(self, data: bytes) -> typing.Any:
+        # Load the value using msgpack
+        return msgpack.unpackb(data)
+
+
+# All of the available codecs
+CODECS: typing.Dict[str, Codec] = {JSONCodec.name: JSONCodec()}
+
+# Register the optional codecs
+if orjson is not None:
+    CODECS[ORJSONCodec.name] = ORJSONCodec()
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+# Select the codec from the environment
+CODEC = CODECS[os.environ.get("CODEC", JSONCodec.name)]
+
+# Select the codec for JSON requests and responses
+JSON_CODEC = CODEC if CODEC.media_type == MIMETYPE_JSON else CODECS[JSONCodec.name]
+
+# Codecs of tagged messages
+TAGS = {codec.tag: codec for codec in CODECS.values() if codec.tag}
+
+
+def encode(value: typing.Any, codec: Codec = CODEC) -> bytes:
+    # Prepend the format tag to the encoded value
+    return codec.tag + codec.dumps(value)
+
+
+def decode(data: typing.Union[str, bytes]) -> typing.Any:
+    # Make sure the data is bytes
+    if isinstance(data, str):
+        data = data.encode()
+
+    # Untagged messages are JSON
+    if not data.startswith(TAG_PREFIX):
+        return JSON_CODEC.loads(data)
+
+    # Find the codec of the tag
+    for tag, codec in TAGS.items():
+        if data.startswith(tag):
+            return codec.loads(data[len(tag):])
+
+    # Tag is not supported
+    raise ValueError(f"Unsupported message format {data[:4]!r}")
+
+
+def negotiate(accept: typing.Optional[str]) -> Codec:
+    # Loop over all accepted media types
+    for media_type in (accept or "").split(","):
+        # Strip the media type parameters
+        media_type = media_type.split(";", 1)[0].strip()
+
+        # Check whether a non-JSON codec supports the media type
+        for codec in CODECS.values():
+            if codec.media_type != MIMETYPE_JSON and codec.media_type == media_type:
+                return codec
+
+    # Fallback to JSON
+    return JSON_CODEC
+
+
+# Add explicit exports
+__all__ = ["MIMETYPE_JSON", "MIMETYPE_MSGPACK", "Codec", "CODECS", "CODEC", "JSON_CODEC", "encode", "decode", "negotiate"]
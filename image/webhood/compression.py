@@ -0,0 +1,264 @@
+import os
+import time
+import zlib
+import typing
+import collections
+
+# Import optional compression libraries
+try:
+    import brotli
+except ImportError:
+    brotli = None  # type: ignore[assignment]
+
+# Import starlette utilities
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from starlette.datastructures import Headers, MutableHeaders
+
+# Content encodings
+ENCODING_BROTLI = "br"
+ENCODING_GZIP = "gzip"
+ENCODING_IDENTITY = "identity"
+
+# Headers for content encoding
+HEADER_ETAG = "ETag"
+HEADER_CONTENT_TYPE = "Content-Type"
+HEADER_CONTENT_LENGTH = "Content-Length"
+HEADER_CONTENT_ENCODING = "Content-Encoding"
+HEADER_ACCEPT_ENCODING = "Accept-Encoding"
+
+# Media types that benefit from compression, other than text
+MIMETYPES_COMPRESSIBLE = {"application/javascript", "application/json", "application/xml", "application/wasm", "image/svg+xml"}
+
+# Media types that must not be buffered by compression
+MIMETYPES_STREAMING = {"text/event-stream"}
+
+# Whether to compress responses, and the minimal response size to compress
+COMPRESSION = bool(int(os.environ.get("COMPRESSION", 1)))
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", 512))
+
+# Response compression encodings, ordered by preference
+COMPRESSION_ENCODINGS = [encoding.strip() for encoding in os.environ.get("COMPRESSION_ENCODINGS", f"{ENCODING_BROTLI},{ENCODING_GZIP}").split(",") if encoding.strip()]
+
+# Whether to negotiate permessage-deflate for sockets
+WEBSOCKET_COMPRESSION = bool(int(os.environ.get("WEBSOCKET_COMPRESSION", 1)))
+
+# Compression levels - responses are compressed per request, so fast levels are preferred
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+
+
+def is_compressible(media_type: str) -> bool:
+    # Strip the media type parameters
+    media_type = media_type.split(";", 1)[0].strip().lower()
+
+    # Check whether the media type is text or a known compressible type
+    return (media_type.startswith("text/") and media_type not in MIMETYPES_STREAMING) or media_type in MIMETYPES_COMPRESSIBLE
+
+
+def select_encoding(accept_encoding: str, encodings: typing.Iterable[str]) -> str:
+    # Parse the accepted encodings and their qualities
+    accepted: typing.Dict[str, float] = {}
+    for value in accept_encoding.split(","):
+        # Split the encoding from its parameters
+        encoding, _, parameters = value.partition(";")
+
+        # Parse the quality, ignoring invalid values
+        quality = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                continue
+
+        # Store the encoding quality
+        accepted[encoding.strip().lower()] = quality
+
+    # Select the preferred accepted encoding
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+
+    # Fallback to the plain content
+    return ENCODING_IDENTITY
+
+
+class Compressor:
+
+    def __init__(self, encoding: str, gzip_level: int = COMPRESSION_GZIP_LEVEL, brotli_quality: int = COMPRESSION_BROTLI_QUALITY) -> None:
+        # Store the encoding
+        self.encoding = encoding
+
+        # Create the underlying compressor
+        if encoding == ENCODING_BROTLI:
+            self.compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self.compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Brotli compressors are flushed and finished explicitly
+        if self.encoding == ENCODING_BROTLI:
+            return self.compressor.process(data) + (self.compressor.finish() if final else self.compressor.flush())
+
+        # Gzip compressors are flushed so that streamed chunks can be decoded immediately
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionResponder:
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int, counters: typing.Counter[str]) -> None:
+        # Store the application and the configuration
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+
+        # Store the measurement counters
+        self.counters = counters
+
+        # Initialize the response state
+        self.start: typing.Optional[Message] = None
+        self.compressor: typing.Optional[Compressor] = None
+        self.passthrough = False
+
+        # Initialize the underlying send function
+        self.send: Send = None  # type: ignore[assignment]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Store the underlying send function
+        self.send = send
+
+        # Call the application
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        # Delay the start message until the first body message, since the headers depend on it
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+
+        # Forward other messages and already decided responses
+        if message["type"] != "http.response.body" or self.start is None or self.passthrough:
+            await self.send(message)
+            return
+
+        # Fetch the body chunk
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        # Compress chunks of responses that are already being compressed
+        if self.compressor is not None:
+            await self.send({"type": "http.response.body", "body": self.compress(body, more_body), "more_body": more_body})
+            return
+
+        # Fetch the response headers
+        headers = MutableHeaders(raw=self.start["headers"])
+
+        # Skip encoded, incompressible and small responses
+        if HEADER_CONTENT_ENCODING in headers or not is_compressible(headers.get(HEADER_CONTENT_TYPE, "")) or (not more_body and len(body) < self.minimum_size):
+            # Count the skipped response
+            self.counters["skipped"] += 1
+
+            # Send the response as-is
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        # Create the compressor
+        self.compressor = Compressor(self.encoding)
+
+        # Count the compressed response
+        self.counters[f"{self.encoding}_responses"] += 1
+
+        # Compress the first chunk
+        compressed = self.compress(body, more_body)
+
+        # Update the content headers
+        headers[HEADER_CONTENT_ENCODING] = self.encoding
+        headers.add_vary_header(HEADER_ACCEPT_ENCODING)
+
+        # Set the content length of complete responses, drop it for streamed responses
+        if not more_body:
+            headers[HEADER_CONTENT_LENGTH] = str(len(compressed))
+        elif HEADER_CONTENT_LENGTH in headers:
+            del headers[HEADER_CONTENT_LENGTH]
+
+        # Strong entity tags must not be shared between encodings
+        etag = headers.get(HEADER_ETAG)
+        if etag is not None and not etag.startswith("W/"):
+            headers[HEADER_ETAG] = "W/" + etag
+
+        # Send the start message and the first chunk
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        # Compress the chunk and measure the compression
+        started = time.perf_counter()
+        compressed = self.compressor.compress(body, not more_body)  # type: ignore[union-attr]
+        self.counters[f"{self.encoding}_nanoseconds"] += int((time.perf_counter() - started) * 1000000000)
+
+        # Count the compressed sizes
+        self.counters[f"{self.encoding}_input_bytes"] += len(body)
+        self.counters[f"{self.encoding}_output_bytes"] += len(compressed)
+
+        # Return the compressed chunk
+        return compressed
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE, encodings: typing.Sequence[str] = tuple(COMPRESSION_ENCODINGS), counters: typing.Optional[typing.Counter[str]] = None) -> None:
+        # Store the application and the configuration
+        self.app = app
+        self.minimum_size = minimum_size
+
+        # Keep only the available encodings
+        self.encodings = [encoding for encoding in encodings if encoding == ENCODING_GZIP or (encoding == ENCODING_BROTLI and brotli is not None)]
+
+        # Initialize the measurement counters
+        self.counters: typing.Counter[str] = counters if counters is not None else collections.Counter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Only HTTP responses with content are compressed, sockets use permessage-deflate
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        # Select the encoding the client accepts
+        encoding = select_encoding(Headers(scope=scope).get(HEADER_ACCEPT_ENCODING, ""), self.encodings)
+
+        # Send plain responses as-is
+        if encoding == ENCODING_IDENTITY:
+            await self.app(scope, receive, send)
+            return
+
+        # Compress the response
+        await CompressionResponder(self.app, encoding, self.minimum_size, self.counters)(scope, receive, send)
+
+
+def compression_statistics(counters: typing.Counter[str]) -> typing.Dict[str, typing.Dict[str, float]]:
+    # Create the statistics of every encoding
+    statistics: typing.Dict[str, typing.Dict[str, float]] = {}
+    for encoding in (ENCODING_BROTLI, ENCODING_GZIP):
+        # Fetch the encoding counters
+        input_bytes = counters[f"{encoding}_input_bytes"]
+        output_bytes = counters[f"{encoding}_output_bytes"]
+
+        # Update the statistics
+        statistics[encoding] = {
+            "responses": counters[f"{encoding}_responses"],
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "ratio": output_bytes / input_bytes if input_bytes else 1.0,
+            "seconds": counters[f"{encoding}_nanoseconds"] / 1000000000,
+        }
+
+    # Add the skipped responses
+    statistics[ENCODING_IDENTITY] = {"responses": counters["skipped"]}
+
+    # Return the statistics
+    return statistics
+
+
+# Add explicit exports
+__all__ = ["Compressor", "CompressionMiddleware", "compression_statistics", "is_compressible", "select_encoding"]
@@ -9,5 +9,14 @@ LOG_LEVEL = logging.DEBUG if DEBUG else logging.INFO
 LOG_FORMAT = "[%(asctime)s] [%(process).4d] [%(levelname).4s] %(message)s"
 LOG_DATEFORMAT = "%Y-%m-%d %H:%M:%S %z"
 
+# Slow consumer policies for socket send queues and subscriber queues
+POLICY_DROP_OLDEST = "drop-oldest"
+POLICY_DROP_NEWEST = "drop-newest"
+POLICY_COALESCE_LATEST = "coalesce-latest"
+POLICY_DISCONNECT = "disconnect"
+
+# All of the slow consumer policies
+POLICIES = [POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_COALESCE_LATEST, POLICY_DISCONNECT]
+
 # Add explicit exports
-__all__ = ["DEBUG", "LOG_LEVEL", "LOG_FORMAT", "LOG_DATEFORMAT"]
+__all__ = ["DEBUG", "LOG_LEVEL", "LOG_FORMAT", "LOG_DATEFORMAT", "POLICY_DROP_OLDEST", "POLICY_DROP_NEWEST", "POLICY_COALESCE_LATEST", "POLICY_DISCONNECT", "POLICIES"]
@@ -1,6 +1,5 @@
 import os
 import time
-import json
 import typing
 import logging
 import asyncio
@@ -16,27 +15,256 @@ import redis.asyncio
 # Import rednest utilities
 from rednest import List, Dictionary
 
-# Patch the dictionary copy type
+# Import codec utilities
+from webhood.codecs import encode, decode
+
+# Import slow consumer policies
+from webhood.constants import POLICIES, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_COALESCE_LATEST
+
+# Import nested utilities
+from webhood.nested import AtomicDictionary, AsyncList, AsyncDictionary
+
+# Import near cache utilities
+from webhood.cache import Cache, CachedList, CachedDictionary
+
+# Import metrics utilities
+from webhood.metrics import METRICS, COLLECTORS, MESSAGES_PUBLISHED, MESSAGES_RECEIVED, MESSAGES_DROPPED, REDIS_COMMAND_DURATION, REDIS_POOL_CONNECTIONS, aggregate
+
+# Patch the dictionary copy types
 # pylint: disable-next=protected-access
-Dictionary._COPY_TYPE = munch.Munch
+Dictionary._COPY_TYPE = AsyncDictionary._COPY_TYPE = munch.Munch
 
 # Default channel
 CHANNEL = "global"
 
+
+class View(typing.Mapping[str, typing.Any]):
+
+    # Views only hold a reference to the underlying data
+    __slots__ = ("_data",)
+
+    def __init__(self, data: typing.Mapping[str, typing.Any]) -> None:
+        # Store the underlying data
+        object.__setattr__(self, "_data", data)
+
+    def __getitem__(self, key: str) -> typing.Any:
+        # Fetch the value
+        value = self._data[key]
+
+        # Lazily create views for nested mappings
+        if isinstance(value, dict):
+            return View(value)
+
+        # Return the value
+        return value
+
+    def __getattr__(self, key: str) -> typing.Any:
+        try:
+            return self[key]
+        except KeyError as exception:
+            # Replace KeyErrors with AttributeErrors
+            raise AttributeError(key) from exception
+
+    def __setattr__(self, key: str, value: typing.Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._data!r})"
+
+
+# Message types for received messages - read-only views are shared between all subscribers of a process, other types are created per subscriber
+MESSAGE_TYPES: typing.Dict[str, typing.Callable[[typing.Any], typing.Any]] = {"munch": munch.Munch, "view": View, "dict": dict}
+
+# Select the message type from the environment
+MESSAGE_TYPE = MESSAGE_TYPES[os.environ.get("MESSAGE_TYPE", "munch")]
+
+# Subscriber queue configuration - messages that slow async receivers did not receive yet, a size of 0 disables the limit
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("SUBSCRIBER_QUEUE_SIZE", 1024))
+SUBSCRIBER_QUEUE_POLICY = os.environ.get("SUBSCRIBER_QUEUE_POLICY", POLICY_DROP_OLDEST)
+
+# Micro-batching delay for coalesced broadcasts
+BROADCAST_DELAY = float(os.environ.get("BROADCAST_DELAY", 0.002))
+
 # Fetch database URL from environment
 REDIS_URL = os.environ["REDIS"]
 
-# Default database connections
-REDIS_SYNC = redis.Redis.from_url(REDIS_URL, decode_responses=True)
-REDIS_ASYNC = redis.asyncio.Redis.from_url(REDIS_URL, decode_responses=True)
+# Connection pool configuration - a pool timeout makes the pool block while all connections are in use
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 0)) or None
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", 0)) or None
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_SOCKET_KEEPALIVE = bool(int(os.environ.get("REDIS_SOCKET_KEEPALIVE", 1)))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 0)) or None
+REDIS_CONNECT_TIMEOUT = float(os.environ.get("REDIS_CONNECT_TIMEOUT", 5)) or None
+
+
+def create_pool(pool_types: typing.Tuple[typing.Type[typing.Any], typing.Type[typing.Any]], **parameters: typing.Any) -> typing.Any:
+    # Unpack the regular and blocking pool types
+    pool_type, blocking_pool_type = pool_types
+
+    # Update the connection parameters
+    parameters.update(health_check_interval=REDIS_HEALTH_CHECK_INTERVAL, socket_keepalive=REDIS_SOCKET_KEEPALIVE, socket_connect_timeout=REDIS_CONNECT_TIMEOUT)
+
+    # Create a blocking pool if a pool timeout was configured
+    if REDIS_POOL_TIMEOUT is not None:
+        return blocking_pool_type.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS or 50, timeout=REDIS_POOL_TIMEOUT, **parameters)
+
+    # Create a regular pool
+    return pool_type.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS, **parameters)
+
+
+class MeasuredRedis(redis.Redis):
+
+    def execute_command(self, *args: typing.Any, **options: typing.Any) -> typing.Any:
+        # Measure the command duration
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - started, str(args[0]).upper())
+
+
+class MeasuredAsyncRedis(redis.asyncio.Redis):
+
+    async def execute_command(self, *args: typing.Any, **options: typing.Any) -> typing.Any:
+        # Measure the command duration
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - started, str(args[0]).upper())
+
+
+def create_sync(**parameters: typing.Any) -> redis.Redis:
+    # Create a client with a new pool, measuring commands as needed
+    return (MeasuredRedis if METRICS else redis.Redis)(connection_pool=create_pool((redis.ConnectionPool, redis.BlockingConnectionPool), **parameters))
+
+
+def create_async(**parameters: typing.Any) -> redis.asyncio.Redis:
+    # Create a client with a new pool, measuring commands as needed
+    return (MeasuredAsyncRedis if METRICS else redis.asyncio.Redis)(connection_pool=create_pool((redis.asyncio.ConnectionPool, redis.asyncio.BlockingConnectionPool), **parameters))
+
+
+class LazyRedis:
+
+    def __init__(self, factory: typing.Callable[[], typing.Any]) -> None:
+        # Store the client factory
+        self._factory = factory
+
+        # Initialize the client and the process that owns it
+        self._client: typing.Any = None
+        self._pid: typing.Optional[int] = None
+
+    def resolve(self) -> typing.Any:
+        # Create the client on first use and after forking, so that connections are never shared between processes
+        if self._client is None or self._pid != os.getpid():
+            self._client, self._pid = self._factory(), os.getpid()
 
+        # Return the client
+        return self._client
 
-def relist(name: str) -> List:
+    def replace(self, factory: typing.Callable[[], typing.Any]) -> None:
+        # Replace the client factory, the client is created again on next use
+        self._factory = factory
+        self._client = None
+
+    def __getattr__(self, name: str) -> typing.Any:
+        # Forward everything to the client
+        return getattr(self.resolve(), name)
+
+
+# Default database connections - created lazily in every process
+REDIS_SYNC: redis.Redis = typing.cast(redis.Redis, LazyRedis(lambda: create_sync(decode_responses=True, socket_timeout=REDIS_SOCKET_TIMEOUT)))
+REDIS_ASYNC: redis.asyncio.Redis = typing.cast(redis.asyncio.Redis, LazyRedis(lambda: create_async(decode_responses=True, socket_timeout=REDIS_SOCKET_TIMEOUT)))
+
+# Binary database connections for Pub / Sub - messages might not be text, and subscribers block without timeouts
+REDIS_BINARY_SYNC: redis.Redis = typing.cast(redis.Redis, LazyRedis(create_sync))
+REDIS_BINARY_ASYNC: redis.asyncio.Redis = typing.cast(redis.asyncio.Redis, LazyRedis(create_async))
+
+# All of the database connections, by name
+CONNECTIONS = {"sync": REDIS_SYNC, "async": REDIS_ASYNC, "binary_sync": REDIS_BINARY_SYNC, "binary_async": REDIS_BINARY_ASYNC}
+
+
+def pool_statistics() -> typing.Dict[str, typing.Dict[str, int]]:
+    # Create the statistics dictionary
+    statistics = {}
+
+    # Loop over all connections that were created in this process
+    for name, connection in CONNECTIONS.items():
+        # pylint: disable-next=protected-access
+        client = typing.cast(LazyRedis, connection)._client
+
+        # Skip connections that were not used yet
+        if client is None:
+            continue
+
+        # Fetch the connection pool
+        pool = client.connection_pool
+
+        # pylint: disable=protected-access
+        if isinstance(pool, redis.BlockingConnectionPool):
+            # Blocking pools keep all connections in a list and idle ones in a queue
+            created = len(pool._connections)
+            available = len([pooled for pooled in list(pool.pool.queue) if pooled is not None])
+        else:
+            # Regular pools keep idle and in-use connections separately
+            available = len(pool._available_connections)
+            created = available + len(pool._in_use_connections)
+        # pylint: enable=protected-access
+
+        # Update the statistics
+        statistics[name] = {"max": pool.max_connections, "created": created, "in_use": created - available, "available": available}
+
+    # Return the statistics
+    return statistics
+
+
+def collect_pools() -> None:
+    # Update the pool usage metrics
+    for name, statistics in pool_statistics().items():
+        for state in ("created", "in_use", "available"):
+            REDIS_POOL_CONNECTIONS.set(name, state, value=statistics[state])
+
+
+# Collect the pool usage metrics and aggregate the metrics of all workers using the database
+COLLECTORS.append(collect_pools)
+aggregate(REDIS_ASYNC)
+
+
+def relist(name: str, cache: typing.Optional[Cache] = None) -> List:
+    # Create a near-cached list if a cache was provided
+    if cache is not None:
+        return CachedList(REDIS_SYNC, name, cache=cache)
+
+    # Create a regular list
     return List(REDIS_SYNC, name)
 
 
-def redict(name: str) -> Dictionary:
-    return Dictionary(REDIS_SYNC, name)
+def redict(name: str, cache: typing.Optional[Cache] = None) -> AtomicDictionary:
+    # Create a near-cached dictionary if a cache was provided
+    if cache is not None:
+        return CachedDictionary(REDIS_SYNC, name, cache=cache)
+
+    # Create a regular dictionary
+    return AtomicDictionary(REDIS_SYNC, name)
+
+
+def arelist(name: str) -> AsyncList:
+    return AsyncList(REDIS_ASYNC, name)
+
+
+def aredict(name: str) -> AsyncDictionary:
+    return AsyncDictionary(REDIS_ASYNC, name)
+
+
+def create_cache(ttl: float = 1, size: int = 1024, channel: typing.Optional[str] = None) -> Cache:
+    # Create a cache that is invalidated by messages on the channel
+    return Cache(ttl, size, channel, REDIS_SYNC)
 
 
 # Database connectivity utilities
@@ -89,32 +317,115 @@ async def wait_for_redis_async() -> None:
 
 def broadcast_sync(channel: str = CHANNEL, connection: redis.Redis = REDIS_SYNC, **parameters: typing.Any) -> None:
     # Publish to channel
-    connection.publish(channel, json.dumps(parameters))
+    connection.publish(channel, encode(parameters))
+
+    # Count the published message
+    MESSAGES_PUBLISHED.inc(channel)
 
 
 async def broadcast_async(channel: str = CHANNEL, connection: redis.Redis = REDIS_ASYNC, **parameters: typing.Any) -> None:
     # Publish to channel
-    await connection.publish(channel, json.dumps(parameters))
+    await connection.publish(channel, encode(parameters))
+
+    # Count the published message
+    MESSAGES_PUBLISHED.inc(channel)
+
+
+def invalidate_sync(channel: str, connection: redis.Redis = REDIS_SYNC) -> None:
+    # Publish an empty message, invalidating all caches of the channel
+    connection.publish(channel, "")
+
+
+async def invalidate_async(channel: str, connection: redis.Redis = REDIS_ASYNC) -> None:
+    # Publish an empty message, invalidating all caches of the channel
+    await connection.publish(channel, "")
+
+
+def broadcast_batch_sync(events: typing.Iterable[typing.Mapping[str, typing.Any]], channel: str = CHANNEL, connection: redis.Redis = REDIS_SYNC) -> None:
+    # Create a non-transactional pipeline
+    with connection.pipeline(transaction=False) as pipeline:
+        # Queue all of the events
+        for event in events:
+            pipeline.publish(channel, encode(event))
+
+            # Count the published message
+            MESSAGES_PUBLISHED.inc(channel)
+
+        # Publish all of the events in a single round trip
+        pipeline.execute()
+
+
+async def broadcast_batch_async(events: typing.Iterable[typing.Mapping[str, typing.Any]], channel: str = CHANNEL, connection: redis.asyncio.Redis = REDIS_ASYNC) -> None:
+    # Create a non-transactional pipeline
+    async with connection.pipeline(transaction=False) as pipeline:
+        # Queue all of the events
+        for event in events:
+            pipeline.publish(channel, encode(event))
+
+            # Count the published message
+            MESSAGES_PUBLISHED.inc(channel)
+
+        # Publish all of the events in a single round trip
+        await pipeline.execute()
 
 
-def receive_sync(channel: str = CHANNEL, connection: redis.Redis = REDIS_SYNC, count: int = 0) -> typing.Iterator[munch.Munch]:
+class Batcher:
+
+    def __init__(self, connection: redis.asyncio.Redis = REDIS_ASYNC, delay: float = BROADCAST_DELAY) -> None:
+        # Store the redis connection
+        self.connection = connection
+
+        # Store the coalescing delay
+        self.delay = delay
+
+        # Initialize the pending messages
+        self.pending: typing.List[typing.Tuple[str, bytes]] = []
+
+        # Initialize the flushing task
+        self.flusher: typing.Optional[asyncio.Task] = None
+
+    async def broadcast(self, channel: str = CHANNEL, **parameters: typing.Any) -> None:
+        # Queue the message
+        self.pending.append((channel, encode(parameters)))
+
+        # Schedule a flush if none is scheduled
+        if self.flusher is None:
+            self.flusher = asyncio.ensure_future(self.flush())
+
+        # Wait for the message to be published
+        await asyncio.shield(self.flusher)
+
+    async def flush(self) -> None:
+        # Wait for more messages to be queued
+        await asyncio.sleep(self.delay)
+
+        # Take all of the pending messages, new messages are scheduled for the next flush
+        pending, self.pending, self.flusher = self.pending, [], None
+
+        # Create a non-transactional pipeline
+        async with self.connection.pipeline(transaction=False) as pipeline:
+            # Queue all of the messages
+            for channel, message in pending:
+                pipeline.publish(channel, message)
+
+                # Count the published message
+                MESSAGES_PUBLISHED.inc(channel)
+
+            # Publish all of the messages in a single network write
+            await pipeline.execute()
+
+
+def receive_sync(channel: str = CHANNEL, connection: redis.Redis = REDIS_BINARY_SYNC, count: int = 0, message_type: typing.Callable[[typing.Any], typing.Any] = MESSAGE_TYPE) -> typing.Iterator[typing.Any]:
     # Count messages
     received = 0
 
     # Create Pub / Sub subscriber
-    with connection.pubsub() as subscriber:
+    with connection.pubsub(ignore_subscribe_messages=True) as subscriber:
         # Subscribe to channel
         subscriber.subscribe(channel)
 
-        # Loop until count is reached
-        while (received < count) or (count == 0):
-            # Receive message from channel
-            message = subscriber.get_message(ignore_subscribe_messages=True, timeout=1)
-
-            # Skip sending if None
-            if message is None:
-                continue
-
+        # Block until messages are received from the channel
+        for message in subscriber.listen():
             # Fetch the message data
             data = message.get("data")
 
@@ -122,44 +433,233 @@ def receive_sync(channel: str = CHANNEL, connection: redis.Redis = REDIS_SYNC, c
             if not data:
                 continue
 
+            # Count the received message
+            MESSAGES_RECEIVED.inc(channel)
+
             # Parse the message
-            yield munch.Munch(json.loads(data))
+            yield message_type(decode(data))
 
             # Bump the receive count
             received += 1
 
+            # Stop once count is reached
+            if received == count:
+                return
+
+
+class Subscription(asyncio.Queue):
+
+    def __init__(self, channel: str, size: int, policy: str) -> None:
+        # Initialize the queue - the size is enforced by the slow subscriber policy, so that failures can always be delivered
+        super().__init__()
+
+        # Store the channel and the queue configuration
+        self.channel = channel
+        self.size = size
+        self.policy = policy
+
+        # Initialize the drop counter
+        self.dropped = 0
+
+    def drop(self, amount: int) -> None:
+        # Update the drop counters
+        self.dropped += amount
+        MESSAGES_DROPPED.inc(self.channel, amount=amount)
+
+    def deliver(self, event: typing.Any) -> None:
+        # Apply the slow subscriber policy if the queue is full
+        if self.size > 0 and self.qsize() >= self.size:
+            if self.policy == POLICY_DROP_NEWEST:
+                # Drop the new message
+                self.drop(1)
+
+                # Nothing more to do
+                return
+
+            if self.policy == POLICY_DROP_OLDEST:
+                # Drop the oldest message
+                self.get_nowait()
+                self.drop(1)
+            else:
+                # Drop all queued messages in favor of the latest, or of the failure that disconnects the subscriber
+                self.drop(self.qsize())
+                while not self.empty():
+                    self.get_nowait()
+
+                # Disconnect the subscriber instead of delivering the message
+                if self.policy != POLICY_COALESCE_LATEST:
+                    event = OverflowError(f"Subscriber of channel {self.channel!r} is too slow")
+
+        # Queue the message
+        self.put_nowait(event)
+
+
+class Hub:
+
+    def __init__(self, connection: redis.asyncio.Redis, message_type: typing.Callable[[typing.Any], typing.Any] = MESSAGE_TYPE) -> None:
+        # Store the redis connection
+        self.connection = connection
+
+        # Store the type of delivered messages
+        self.message_type = message_type
+
+        # Store the event loop that owns the readers
+        self.loop = asyncio.get_running_loop()
+
+        # Initialize the subscriber queues of every channel
+        self.subscribers: typing.Dict[str, typing.Set[Subscription]] = {}
+
+        # Initialize the reader task and readiness future of every channel
+        self.readers: typing.Dict[str, asyncio.Task] = {}
+        self.readiness: typing.Dict[str, asyncio.Future] = {}
+
+    async def subscribe(self, channel: str, size: int = SUBSCRIBER_QUEUE_SIZE, policy: str = SUBSCRIBER_QUEUE_POLICY) -> Subscription:
+        # Make sure the policy is valid
+        assert policy in POLICIES, f"Subscriber queue policy must be one of {POLICIES}"
+
+        # Create a new subscriber queue
+        queue = Subscription(channel, size, policy)
+
+        # Register the subscriber queue on the channel
+        self.subscribers.setdefault(channel, set()).add(queue)
 
-async def receive_async(channel: str = CHANNEL, connection: redis.Redis = REDIS_ASYNC, count: int = 0) -> typing.AsyncIterator[munch.Munch]:
+        # Create a channel reader if this is the first subscriber
+        if channel not in self.readers:
+            # Create the readiness future before starting the reader
+            self.readiness[channel] = self.loop.create_future()
+
+            # Start reading from the channel
+            self.readers[channel] = self.loop.create_task(self._read(channel, self.readiness[channel]))
+
+        try:
+            # Wait for the channel subscription to be active
+            await asyncio.shield(self.readiness[channel])
+        except BaseException:
+            # Unregister the subscriber queue
+            self.unsubscribe(channel, queue)
+
+            # Re-raise the exception
+            raise
+
+        # Return the subscriber queue
+        return queue
+
+    def unsubscribe(self, channel: str, queue: Subscription) -> None:
+        # Fetch the subscriber queues of the channel
+        queues = self.subscribers.get(channel, set())
+
+        # Unregister the subscriber queue
+        queues.discard(queue)
+
+        # Keep the reader if there are still subscribers
+        if queues:
+            return
+
+        # Drop the channel subscribers and readiness
+        self.subscribers.pop(channel, None)
+        self.readiness.pop(channel, None)
+
+        # Fetch the channel reader
+        reader = self.readers.pop(channel, None)
+
+        # Cancel the channel reader
+        if reader is not None:
+            reader.cancel()
+
+    async def _read(self, channel: str, readiness: asyncio.Future) -> None:
+        try:
+            # Create a single Pub / Sub subscriber for the channel
+            async with self.connection.pubsub(ignore_subscribe_messages=True) as subscriber:
+                # Subscribe to channel
+                await subscriber.subscribe(channel)
+
+                # Notify subscribers that the subscription is active
+                readiness.set_result(None)
+
+                # Wait for messages until cancelled - the reader only wakes up when a message arrives
+                async for message in subscriber.listen():
+                    # Fetch the message data
+                    data = message.get("data")
+
+                    # Only parse if data is valid
+                    if not data:
+                        continue
+
+                    # Count the received message
+                    MESSAGES_RECEIVED.inc(channel)
+
+                    # Parse read-only views once, they are shared between all subscribers
+                    shared = View(decode(data)) if self.message_type is View else None
+
+                    # Fan out the message to all subscribers - other types are parsed per subscriber, so that subscribers cannot modify each other's messages
+                    for queue in list(self.subscribers.get(channel, ())):
+                        queue.deliver(shared if shared is not None else self.message_type(decode(data)))
+        except asyncio.CancelledError:
+            # Re-raise the cancellation
+            raise
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            # Log the reader failure
+            logging.error("Channel %r reader failed: %r", channel, exception)
+
+            # Notify waiting subscribers of the failure
+            if not readiness.done():
+                readiness.set_exception(exception)
+
+            # Notify active subscribers of the failure, even if their queues are full
+            for queue in self.subscribers.get(channel, ()):
+                queue.put_nowait(exception)
+
+            # Drop the failed reader so that the next subscriber creates a new one
+            if self.readers.get(channel) is asyncio.current_task():
+                self.readers.pop(channel, None)
+                self.readiness.pop(channel, None)
+
+
+# Subscription hubs of this process
+HUBS: typing.Dict[typing.Tuple[redis.asyncio.Redis, typing.Callable[[typing.Any], typing.Any]], Hub] = {}
+
+
+def fetch_hub(connection: redis.asyncio.Redis = REDIS_BINARY_ASYNC, message_type: typing.Callable[[typing.Any], typing.Any] = MESSAGE_TYPE) -> Hub:
+    # Fetch the current hub of the connection and message type
+    hub = HUBS.get((connection, message_type))
+
+    # Create a new hub if none exists or if the event loop changed
+    if hub is None or hub.loop is not asyncio.get_running_loop():
+        hub = HUBS[(connection, message_type)] = Hub(connection, message_type)
+
+    # Return the hub
+    return hub
+
+
+async def receive_async(channel: str = CHANNEL, connection: redis.Redis = REDIS_BINARY_ASYNC, count: int = 0, message_type: typing.Callable[[typing.Any], typing.Any] = MESSAGE_TYPE, queue_size: int = SUBSCRIBER_QUEUE_SIZE, queue_policy: str = SUBSCRIBER_QUEUE_POLICY) -> typing.AsyncIterator[typing.Any]:
     # Count messages
     received = 0
 
-    # Create Pub / Sub subscriber
-    async with connection.pubsub() as subscriber:
-        # Subscribe to channel
-        await subscriber.subscribe(channel)
+    # Fetch the subscription hub
+    hub = fetch_hub(connection, message_type)
 
+    # Subscribe to channel
+    queue = await hub.subscribe(channel, queue_size, queue_policy)
+
+    try:
         # Loop until count is reached
         while (received < count) or (count == 0):
             # Receive message from channel
-            message = await subscriber.get_message(ignore_subscribe_messages=True, timeout=1)
-
-            # Skip sending if None
-            if message is None:
-                continue
-
-            # Fetch the message data
-            data = message.get("data")
+            event = await queue.get()
 
-            # Only parse if data is valid
-            if not data:
-                continue
+            # Raise reader failures
+            if isinstance(event, Exception):
+                raise event
 
-            # Parse the message
-            yield munch.Munch(json.loads(data))
+            # Yield the message
+            yield event
 
             # Bump the receive count
             received += 1
+    finally:
+        # Unsubscribe from channel
+        hub.unsubscribe(channel, queue)
 
 
 # Add explicit exports
-__all__ = ["CHANNEL", "REDIS_URL", "REDIS_ASYNC", "relist", "redict", "wait_for_redis_sync", "wait_for_redis_async", "broadcast_sync", "broadcast_async", "receive_sync", "receive_async"]
+__all__ = ["CHANNEL", "View", "Cache", "REDIS_URL", "REDIS_ASYNC", "REDIS_BINARY_ASYNC", "pool_statistics", "relist", "redict", "arelist", "aredict", "create_cache", "wait_for_redis_sync", "wait_for_redis_async", "broadcast_sync", "broadcast_async", "invalidate_sync", "invalidate_async", "broadcast_batch_sync", "broadcast_batch_async", "Batcher", "receive_sync", "receive_async", "Subscription", "Hub", "fetch_hub", "LazyRedis"]
@@ -0,0 +1,279 @@
+import os
+import time
+import socket
+import typing
+import logging
+
+# Import redis utilities
+import redis
+import redis.asyncio
+
+# Import codec utilities
+from webhood.codecs import encode, decode
+
+# Import nested utilities
+from webhood.nested import register_script
+
+# Import database utilities
+from webhood.database import MESSAGE_TYPE, REDIS_BINARY_SYNC, REDIS_BINARY_ASYNC
+
+# Import metrics utilities
+from webhood.metrics import JOBS_ENQUEUED, JOBS_PROCESSED, JOB_LATENCY, JOB_QUEUE_DEPTH
+
+# Prefix of job queue keys
+JOB_PREFIX = "jobs:"
+
+# Name of the consumer group shared by all workers
+JOB_GROUP = os.environ.get("JOB_GROUP", "workers")
+
+# Number of retries for failed jobs, before they are moved to the dead-letter stream
+JOB_RETRIES = int(os.environ.get("JOB_RETRIES", 5))
+
+# Base and maximal delays before retrying failed jobs - the delay doubles on every attempt
+JOB_BACKOFF = float(os.environ.get("JOB_BACKOFF", 1))
+JOB_BACKOFF_MAX = float(os.environ.get("JOB_BACKOFF_MAX", 300))
+
+# Time after which jobs of unresponsive workers are retried by other workers
+JOB_VISIBILITY_TIMEOUT = float(os.environ.get("JOB_VISIBILITY_TIMEOUT", 60))
+
+# Maximal number of concurrent jobs per queue and worker
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", 16))
+
+# Maximal time to block while waiting for new jobs, which is also the resolution of delayed jobs
+JOB_BLOCK = float(os.environ.get("JOB_BLOCK", 1))
+
+# Approximate maximal number of dead jobs per queue - queued jobs are never trimmed
+JOB_DEAD_MAX_LENGTH = int(os.environ.get("JOB_DEAD_MAX_LENGTH", 100000))
+
+# Stream entry field holding the job
+FIELD_JOB = b"job"
+
+# Server-side promotion of due delayed jobs to the stream
+PROMOTE_SCRIPT = """
+local jobs = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call("ZREM", KEYS[1], job)
+    redis.call("XADD", KEYS[2], "*", "job", job)
+end
+return #jobs
+"""
+
+
+def create_job(parameters: typing.Mapping[str, typing.Any], attempt: int = 0, enqueued: typing.Optional[float] = None) -> bytes:
+    # Encode the job - the random identifier keeps identical delayed jobs apart
+    return encode({"id": os.urandom(8).hex(), "parameters": dict(parameters), "attempt": attempt, "enqueued": enqueued or time.time()})
+
+
+def backoff(attempt: int) -> float:
+    # Double the delay on every attempt
+    return min(JOB_BACKOFF * (2 ** attempt), JOB_BACKOFF_MAX)
+
+
+def enqueue_sync(queue: str, connection: redis.Redis = REDIS_BINARY_SYNC, delay: float = 0, **parameters: typing.Any) -> None:
+    # Create the job
+    job = create_job(parameters)
+
+    if delay > 0:
+        # Schedule the job
+        connection.zadd(f"{JOB_PREFIX}{queue}:delayed", {job: time.time() + delay})
+    else:
+        # Queue the job
+        connection.xadd(f"{JOB_PREFIX}{queue}", {FIELD_JOB: job})
+
+    # Count the enqueued job
+    JOBS_ENQUEUED.inc(queue)
+
+
+async def enqueue_async(queue: str, connection: redis.asyncio.Redis = REDIS_BINARY_ASYNC, delay: float = 0, **parameters: typing.Any) -> None:
+    # Create the job
+    job = create_job(parameters)
+
+    if delay > 0:
+        # Schedule the job
+        await connection.zadd(f"{JOB_PREFIX}{queue}:delayed", {job: time.time() + delay})
+    else:
+        # Queue the job
+        await connection.xadd(f"{JOB_PREFIX}{queue}", {FIELD_JOB: job})
+
+    # Count the enqueued job
+    JOBS_ENQUEUED.inc(queue)
+
+
+class Job:
+
+    def __init__(self, identifier: bytes, data: bytes, message_type: typing.Callable[[typing.Any], typing.Any] = MESSAGE_TYPE) -> None:
+        # Store the stream entry identifier
+        self.identifier = identifier
+
+        # Decode the job
+        job = decode(data)
+
+        # Store the job state
+        self.parameters = job["parameters"]
+        self.attempt = job["attempt"]
+        self.enqueued = job["enqueued"]
+
+        # Create the parameters passed to the function
+        self.message = message_type(self.parameters)
+
+
+class Queue:
+
+    def __init__(self, name: str, connection: redis.asyncio.Redis = REDIS_BINARY_ASYNC, group: str = JOB_GROUP, retries: int = JOB_RETRIES, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT) -> None:
+        # Store the queue name and connection
+        self.name = name
+        self.connection = connection
+
+        # Store the consumer configuration
+        self.group = group
+        self.retries = retries
+        self.visibility_timeout = visibility_timeout
+
+        # Create the queue keys
+        self.stream = f"{JOB_PREFIX}{name}"
+        self.delayed = f"{self.stream}:delayed"
+        self.dead = f"{self.stream}:dead"
+
+        # Create the consumer name of this worker
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def create(self) -> None:
+        try:
+            # Create the consumer group and the stream, starting with all existing jobs
+            await self.connection.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as exception:
+            # Ignore existing groups
+            if "BUSYGROUP" not in str(exception):
+                raise
+
+    async def promote(self, count: int = 100) -> int:
+        # Move due delayed jobs to the stream
+        return int(await register_script(self.connection, PROMOTE_SCRIPT)(keys=[self.delayed, self.stream], args=[time.time(), count]))
+
+    async def read(self, count: int, block: float = JOB_BLOCK) -> typing.List[Job]:
+        # Read new jobs, blocking until jobs are available
+        response = await self.connection.xreadgroup(self.group, self.consumer, {self.stream: ">"}, count=count, block=int(block * 1000))
+
+        # Initialize the jobs
+        jobs = []
+
+        for _, entries in response:
+            for identifier, fields in entries:
+                # Create the job, skipping invalid entries
+                job = await self.parse(identifier, fields)
+                if job is None:
+                    continue
+
+                # Observe the queue latency of the job
+                JOB_LATENCY.observe(max(time.time() - job.enqueued, 0), self.name)
+
+                # Store the job
+                jobs.append(job)
+
+        # Return the jobs
+        return jobs
+
+    async def reclaim(self, count: int = 100) -> int:
+        # Find the jobs of workers that did not respond within the visibility timeout
+        pending = await self.connection.xpending_range(self.stream, self.group, min="-", max="+", count=count, idle=int(self.visibility_timeout * 1000))
+
+        # Nothing to reclaim if all workers are responsive
+        if not pending:
+            return 0
+
+        # Claim the jobs, skipping jobs that other workers claimed meanwhile
+        response = await self.connection.xclaim(self.stream, self.group, self.consumer, int(self.visibility_timeout * 1000), [entry["message_id"] for entry in pending])
+
+        # Initialize the reclaimed job count
+        reclaimed = 0
+
+        for identifier, fields in response:
+            # Acknowledge jobs that were deleted meanwhile
+            if fields is None:
+                await self.connection.xack(self.stream, self.group, identifier)
+                continue
+
+            # Create the job, skipping invalid entries
+            job = await self.parse(identifier, fields)
+            if job is None:
+                continue
+
+            # Count the crashed delivery as a failed attempt - the next attempt is stored in the retried job, so crashes are counted once
+            await self.fail(job)
+
+            # Count the reclaimed job
+            reclaimed += 1
+
+        # Return the number of reclaimed jobs
+        return reclaimed
+
+    async def parse(self, identifier: bytes, fields: typing.Dict[bytes, bytes]) -> typing.Optional[Job]:
+        try:
+            # Create the job
+            return Job(identifier, fields[FIELD_JOB])
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            # Log the invalid entry
+            logging.warning("Job %r of queue %s is invalid: %r", identifier, self.name, exception)
+
+        # Move the raw entry to the dead-letter stream, so that it does not block the queue
+        async with self.connection.pipeline(transaction=True) as pipeline:
+            pipeline.xadd(self.dead, fields or {FIELD_JOB: b""}, maxlen=JOB_DEAD_MAX_LENGTH, approximate=True)
+            pipeline.xack(self.stream, self.group, identifier)
+            pipeline.xdel(self.stream, identifier)
+            await pipeline.execute()
+
+        # Count the dead job
+        JOBS_PROCESSED.inc(self.name, "dead")
+
+        # The entry is not a job
+        return None
+
+    async def heartbeat(self, job: Job) -> None:
+        # Reset the idle time of the job, so that other workers do not claim it
+        await self.connection.xclaim(self.stream, self.group, self.consumer, 0, [job.identifier], justid=True)
+
+    async def complete(self, job: Job) -> None:
+        # Acknowledge and delete the job
+        async with self.connection.pipeline(transaction=True) as pipeline:
+            pipeline.xack(self.stream, self.group, job.identifier)
+            pipeline.xdel(self.stream, job.identifier)
+            await pipeline.execute()
+
+        # Count the completed job
+        JOBS_PROCESSED.inc(self.name, "success")
+
+    async def fail(self, job: Job) -> None:
+        async with self.connection.pipeline(transaction=True) as pipeline:
+            if job.attempt < self.retries:
+                # Schedule the next attempt with an exponential backoff
+                pipeline.zadd(self.delayed, {create_job(job.parameters, job.attempt + 1, job.enqueued): time.time() + backoff(job.attempt)})
+            else:
+                # Move the job to the dead-letter stream
+                pipeline.xadd(self.dead, {FIELD_JOB: create_job(job.parameters, job.attempt, job.enqueued)}, maxlen=JOB_DEAD_MAX_LENGTH, approximate=True)
+
+            # Acknowledge and delete the failed attempt
+            pipeline.xack(self.stream, self.group, job.identifier)
+            pipeline.xdel(self.stream, job.identifier)
+            await pipeline.execute()
+
+        # Count the failed job
+        JOBS_PROCESSED.inc(self.name, "retry" if job.attempt < self.retries else "dead")
+
+    async def measure(self) -> None:
+        # Fetch the queue sizes
+        async with self.connection.pipeline(transaction=False) as pipeline:
+            pipeline.xlen(self.stream)
+            pipeline.xpending(self.stream, self.group)
+            pipeline.zcard(self.delayed)
+            pipeline.xlen(self.dead)
+            length, pending, delayed, dead = await pipeline.execute()
+
+        # Update the queue depth
+        JOB_QUEUE_DEPTH.set(self.name, "ready", value=length - pending["pending"])
+        JOB_QUEUE_DEPTH.set(self.name, "running", value=pending["pending"])
+        JOB_QUEUE_DEPTH.set(self.name, "delayed", value=delayed)
+        JOB_QUEUE_DEPTH.set(self.name, "dead", value=dead)
+
+
+# Add explicit exports
+__all__ = ["enqueue_sync", "enqueue_async", "Job", "Queue"]
@@ -0,0 +1,335 @@
+import os
+import socket
+import typing
+import asyncio
+import bisect
+import logging
+import threading
+import contextlib
+
+# Import codec utilities
+from webhood.codecs import JSON_CODEC
+
+# Whether to collect metrics, and the path of the metrics endpoint - disabled by default, since metrics expose routes and workers
+METRICS = bool(int(os.environ.get("METRICS", 0)))
+METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
+
+# Bearer token that scrapers must send to read the metrics endpoint - empty allows any client
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Interval for publishing the metrics of every worker, so that all workers can be aggregated
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", 5))
+
+# Prefix of published metrics keys
+METRICS_PREFIX = "metrics:"
+
+# Key of the set of workers that published their metrics
+METRICS_WORKERS = f"{METRICS_PREFIX}workers"
+
+# Media type of the exposition format
+MIMETYPE_METRICS = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default latency buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Sample type - sample name suffix, label pairs and value
+Sample = typing.Tuple[str, typing.Tuple[typing.Tuple[str, str], ...], float]
+
+
+class Metric:
+
+    # Metric type, used for exposition
+    kind: str = ""
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = (), shared: bool = False) -> None:
+        # Store the metric definition
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+
+        # Store whether the metric describes shared state - all workers report the same state, so values are not labelled by worker
+        self.shared = shared
+
+        # Initialize the values of every label set
+        self.values: typing.Dict[typing.Tuple[str, ...], typing.Any] = {}
+
+        # Initialize the lock, since metrics are updated from handler threads
+        self.lock = threading.Lock()
+
+        # Register the metric
+        REGISTRY[name] = self
+
+    def snapshot(self) -> typing.List[Sample]:
+        with self.lock:
+            # Create a sample for every label set
+            return [("", tuple(zip(self.labels, values)), value) for values, value in self.values.items()]
+
+
+class Counter(Metric):
+
+    # Metric type
+    kind = "counter"
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+    def set(self, *values: str, value: float) -> None:
+        # Totals that are counted elsewhere are copied by collectors
+        with self.lock:
+            self.values[values] = value
+
+
+class Gauge(Metric):
+
+    # Metric type
+    kind = "gauge"
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+    def dec(self, *values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[values] = self.values.get(values, 0) - amount
+
+    def set(self, *values: str, value: float) -> None:
+        with self.lock:
+            self.values[values] = value
+
+
+class Histogram(Metric):
+
+    # Metric type
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = (), buckets: typing.Sequence[float] = BUCKETS) -> None:
+        # Initialize the metric
+        super().__init__(name, description, labels)
+
+        # Store the bucket bounds
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *values: str) -> None:
+        with self.lock:
+            # Fetch the bucket counts and the sum of the label set - the last bucket is +Inf
+            state = self.values.get(values)
+            if state is None:
+                state = self.values[values] = [0] * (len(self.buckets) + 1) + [0.0]
+
+            # Count the value in its bucket only, buckets are accumulated when exposed
+            state[bisect.bisect_left(self.buckets, value)] += 1
+
+            # Update the sum
+            state[-1] += value
+
+    def snapshot(self) -> typing.List[Sample]:
+        # Create the samples list
+        samples: typing.List[Sample] = []
+
+        with self.lock:
+            for values, state in self.values.items():
+                # Create the label pairs
+                labels = tuple(zip(self.labels, values))
+
+                # Accumulate the bucket counts
+                count = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), state):
+                    count += bucket_count
+                    samples.append(("_bucket", labels + (("le", "+Inf" if bound == float("inf") else repr(bound)),), count))
+
+                # Add the sum and the count
+                samples.append(("_sum", labels, state[-1]))
+                samples.append(("_count", labels, count))
+
+        # Return the samples
+        return samples
+
+
+# All of the registered metrics, by name
+REGISTRY: typing.Dict[str, Metric] = {}
+
+# Functions that update metrics right before they are collected
+COLLECTORS: typing.List[typing.Callable[[], None]] = []
+
+# Request metrics
+REQUESTS = Counter("webhood_requests_total", "Handled requests by route, method and status", ("route", "method", "status"))
+REQUEST_DURATION = Histogram("webhood_request_duration_seconds", "Request handling duration by route and method", ("route", "method"))
+REQUESTS_IN_FLIGHT = Gauge("webhood_requests_in_flight", "Requests that are currently being handled by route", ("route",))
+
+# Socket metrics
+SOCKETS_OPEN = Gauge("webhood_sockets_open", "Open sockets by route", ("route",))
+SOCKET_MESSAGES_DROPPED = Counter("webhood_socket_messages_dropped_total", "Socket messages dropped by the slow consumer policy by route", ("route",))
+SOCKET_MESSAGES_IGNORED = Counter("webhood_socket_messages_ignored_total", "Received socket messages dropped since the function did not receive them by route", ("route",))
+
+# Pub / Sub metrics
+MESSAGES_PUBLISHED = Counter("webhood_messages_published_total", "Published messages by channel", ("channel",))
+MESSAGES_RECEIVED = Counter("webhood_messages_received_total", "Received messages by channel", ("channel",))
+MESSAGES_DROPPED = Counter("webhood_messages_dropped_total", "Received messages dropped by the slow subscriber policy by channel", ("channel",))
+
+# Redis metrics
+REDIS_COMMAND_DURATION = Histogram("webhood_redis_command_duration_seconds", "Redis command duration by command", ("command",))
+REDIS_POOL_CONNECTIONS = Gauge("webhood_redis_pool_connections", "Redis pool connections by pool and state", ("pool", "state"))
+
+# Near cache metrics
+CACHE_LOOKUPS = Counter("webhood_cache_lookups_total", "Near cache lookups by result", ("result",))
+
+# Handler pool metrics
+HANDLER_CALLS = Gauge("webhood_handler_calls", "Synchronous handler calls in the pool by state", ("state",))
+HANDLER_REJECTED = Counter("webhood_handler_rejected_total", "Synchronous handler calls rejected because the pool queue was full")
+
+# Response compression metrics
+COMPRESSION_RESPONSES = Counter("webhood_compression_responses_total", "Responses by content encoding, identity responses were not compressed", ("encoding",))
+COMPRESSION_BYTES = Counter("webhood_compression_bytes_total", "Compressed bytes by content encoding and direction", ("encoding", "direction"))
+COMPRESSION_SECONDS = Counter("webhood_compression_seconds_total", "Time spent compressing responses by content encoding", ("encoding",))
+
+# Background task metrics
+TASK_RUNS = Counter("webhood_task_runs_total", "Background task runs by task and result", ("task", "result"))
+TASK_DURATION = Histogram("webhood_task_duration_seconds", "Background task run duration by task", ("task",))
+
+# Job queue metrics
+JOBS_ENQUEUED = Counter("webhood_jobs_enqueued_total", "Enqueued jobs by queue", ("queue",))
+JOBS_PROCESSED = Counter("webhood_jobs_processed_total", "Processed jobs by queue and result", ("queue", "result"))
+JOB_LATENCY = Histogram("webhood_job_latency_seconds", "Time from enqueueing to processing by queue", ("queue",))
+JOB_QUEUE_DEPTH = Gauge("webhood_job_queue_depth", "Jobs by queue and state", ("queue", "state"), shared=True)
+
+
+def snapshot() -> typing.List[typing.Tuple[str, str, typing.Tuple[typing.Tuple[str, str], ...], float]]:
+    # Update the collected metrics
+    for collector in COLLECTORS:
+        try:
+            collector()
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            logging.warning("Metrics collector failed: %r", exception)
+
+    # Create the samples of all metrics
+    return [(name, suffix, labels, value) for name, metric in REGISTRY.items() for suffix, labels, value in metric.snapshot()]
+
+
+def render(samples: typing.Iterable[typing.Tuple[str, str, typing.Tuple[typing.Tuple[str, str], ...], float]]) -> str:
+    # Group the samples by metric
+    grouped: typing.Dict[str, typing.List[str]] = {name: [] for name in REGISTRY}
+
+    for name, suffix, labels, value in samples:
+        # Skip unknown metrics
+        if name not in grouped:
+            continue
+
+        # Format the labels, escaping the values
+        formatted = ",".join('{}="{}"'.format(label, str(label_value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for label, label_value in labels)
+
+        # Format the sample
+        grouped[name].append(f"{name}{suffix}{{{formatted}}} {value!r}" if formatted else f"{name}{suffix} {value!r}")
+
+    # Create the exposition lines
+    lines: typing.List[str] = []
+    for name, metric in REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.description}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(grouped[name])
+
+    # Return the exposition text
+    return "\n".join(lines) + "\n"
+
+
+class Aggregator:
+
+    def __init__(self, connection: typing.Any, interval: float = METRICS_INTERVAL) -> None:
+        # Store the redis connection and the publishing interval
+        self.connection = connection
+        self.interval = interval
+
+        # Initialize the publisher task and the process that owns it
+        self.task: typing.Optional[asyncio.Task] = None
+        self.pid: typing.Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        # Create the key of this worker
+        return f"{METRICS_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+    def start(self) -> None:
+        # Start publishing once per process and event loop
+        if self.task is not None and not self.task.done() and self.pid == os.getpid():
+            return
+
+        # Create the publisher task
+        self.task, self.pid = asyncio.get_running_loop().create_task(self._run()), os.getpid()
+
+    async def publish(self) -> None:
+        # Publish the samples of this worker, expiring them if the worker stops, and register the worker
+        async with self.connection.pipeline(transaction=False) as pipeline:
+            pipeline.set(self.key, JSON_CODEC.dumps(snapshot()), px=int(self.interval * 3000))
+            pipeline.sadd(METRICS_WORKERS, self.key)
+            await pipeline.execute()
+
+    async def collect(self) -> str:
+        # Publish the samples of this worker first, so that they are up to date
+        await self.publish()
+
+        # Fetch the published samples of all registered workers
+        keys = sorted(await self.connection.smembers(METRICS_WORKERS))
+        published = await self.connection.mget(keys)
+
+        # Unregister workers whose samples expired
+        expired = [key for key, data in zip(keys, published) if data is None]
+        if expired:
+            await self.connection.srem(METRICS_WORKERS, *expired)
+
+        # Initialize the aggregated samples
+        aggregated: typing.Dict[typing.Tuple[str, str, typing.Tuple[typing.Tuple[str, str], ...]], float] = {}
+
+        for key, data in zip(keys, published):
+            # Skip workers that expired
+            if data is None:
+                continue
+
+            # Label the samples by worker, so that every counter keeps increasing even when workers are replaced - shared metrics use the highest value instead
+            for name, suffix, labels, value in JSON_CODEC.loads(data):
+                if name in REGISTRY and REGISTRY[name].shared:
+                    identifier = (name, suffix, tuple(tuple(label) for label in labels))
+                    aggregated[identifier] = max(aggregated.get(identifier, value), value)
+                else:
+                    aggregated[(name, suffix, (("worker", key[len(METRICS_PREFIX):]),) + tuple(tuple(label) for label in labels))] = value
+
+        # Render the aggregated samples
+        return render((name, suffix, labels, value) for (name, suffix, labels), value in aggregated.items())
+
+    async def _run(self) -> None:
+        while True:
+            # Publish the samples, ignoring temporary failures
+            with contextlib.suppress(Exception):
+                await self.publish()
+
+            # Wait for the next interval
+            await asyncio.sleep(self.interval)
+
+
+# Aggregator of all workers, if a shared database is available
+AGGREGATOR: typing.Optional[Aggregator] = None
+
+
+def aggregate(connection: typing.Any) -> None:
+    global AGGREGATOR  # pylint: disable=global-statement
+
+    # Aggregate the metrics of all workers using the connection
+    AGGREGATOR = Aggregator(connection)
+
+
+def start() -> None:
+    # Start publishing the metrics of this worker
+    if METRICS and AGGREGATOR is not None:
+        AGGREGATOR.start()
+
+
+async def collect() -> str:
+    # Render the local metrics if there is no shared database
+    if AGGREGATOR is None:
+        return render(snapshot())
+
+    # Render the metrics of all workers
+    return await AGGREGATOR.collect()
+
+
+# Add explicit exports
+__all__ = ["METRICS", "METRICS_PATH", "METRICS_TOKEN", "Counter", "Gauge", "Histogram", "REGISTRY", "COLLECTORS", "aggregate", "start", "collect"]
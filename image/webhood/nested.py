@@ -0,0 +1,598 @@
+import os
+import ast
+import typing
+
+# Import abstract types
+from collections.abc import Mapping
+
+# Import redis utilities
+import redis
+import redis.asyncio
+
+# Import rednest utilities
+from rednest import List, Dictionary
+
+# Redis identifiers of nested types, compatible with rednest
+IDENTIFIER_HASH = "hash"
+IDENTIFIER_LIST = "list"
+
+# Server-side atomic increment of a plain integer value
+INCREMENT_SCRIPT = """
+local identifier = redis.call("HGET", KEYS[1], ARGV[1])
+local value = 0
+if identifier then
+    if string.sub(identifier, 1, 1) ~= ":" then
+        return redis.error_reply("Value is not an integer")
+    end
+    value = tonumber(string.sub(identifier, 2))
+    if value == nil or math.floor(value) ~= value then
+        return redis.error_reply("Value is not an integer")
+    end
+end
+value = value + tonumber(ARGV[2])
+redis.call("HSET", KEYS[1], ARGV[1], ":" .. string.format("%d", value))
+return value
+"""
+
+# Server-side compare-and-swap of a value identifier
+COMPARE_AND_SWAP_SCRIPT = """
+if redis.call("HGET", KEYS[1], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call("HSET", KEYS[1], ARGV[1], ARGV[3])
+return 1
+"""
+
+# Server-side append to a nested list, creating the list if needed - fails with -1 if the value changed since it was read
+APPEND_SCRIPT = """
+local identifier = redis.call("HGET", KEYS[1], ARGV[1])
+if (identifier or "") ~= ARGV[3] then
+    return -1
+end
+if not identifier then
+    redis.call("HSET", KEYS[1], ARGV[1], ARGV[4])
+end
+return redis.call("RPUSH", KEYS[2], ARGV[2])
+"""
+
+
+def register_script(connection: typing.Union[redis.Redis, redis.asyncio.Redis], script: str) -> typing.Any:
+    # Register the script with the client the connection currently resolves to, so that scripts never outlive a fork - registering only hashes the script, which is called using EVALSHA
+    return connection.register_script(script)
+
+
+class AtomicDictionary(Dictionary):
+
+    def increment(self, key: typing.Any, amount: int = 1) -> int:
+        # Increment the value server-side in a single round trip
+        return int(register_script(self._connection, INCREMENT_SCRIPT)(keys=[self._key], args=[self._encode(key), amount]))
+
+    def decrement(self, key: typing.Any, amount: int = 1) -> int:
+        # Decrement using a negative increment
+        return self.increment(key, -amount)
+
+    def set_if_absent(self, key: typing.Any, value: typing.Any) -> bool:
+        # Create the value identifier
+        with self._create_identifier_from_value(value) as identifier:
+            # Try inserting the identifier atomically
+            if self._connection.hsetnx(self._key, self._encode(key), identifier):
+                return True
+
+            # Delete the unused identifier
+            self._delete_by_identifier(identifier)
+
+        # The key already exists
+        return False
+
+    def compare_and_swap(self, key: typing.Any, expected: typing.Any, value: typing.Any) -> bool:
+        # Create the value identifier
+        with self._create_identifier_from_value(value) as identifier:
+            # Try swapping the identifier atomically
+            if register_script(self._connection, COMPARE_AND_SWAP_SCRIPT)(keys=[self._key], args=[self._encode(key), f":{self._encode(expected)}", identifier]):
+                return True
+
+            # Delete the unused identifier
+            self._delete_by_identifier(identifier)
+
+        # The value did not match
+        return False
+
+    def append(self, key: typing.Any, value: typing.Any) -> int:
+        # Create the item identifier
+        with self._create_identifier_from_value(value) as identifier:
+            while True:
+                # Fetch the current list identifier
+                current = self._connection.hget(self._key, self._encode(key))
+
+                # Create a new list identifier if the list does not exist - the empty list has no key until the item is pushed
+                if current is None:
+                    with self._create_identifier_from_value([]) as list_identifier:
+                        pass
+                else:
+                    list_identifier = current if isinstance(current, str) else current.decode(self._ENCODING)
+
+                # Resolve the list, so that its key is passed to the script
+                nested_list = self._fetch_by_identifier(list_identifier)
+                if not isinstance(nested_list, List):
+                    raise TypeError("Value is not a list")
+
+                # Append the item server-side and return the new list length, retrying if the value changed meanwhile
+                # pylint: disable-next=protected-access
+                length = int(register_script(self._connection, APPEND_SCRIPT)(keys=[self._key, nested_list._key], args=[self._encode(key), identifier, list_identifier if current is not None else "", list_identifier]))
+                if length >= 0:
+                    return length
+
+
+class AsyncNested:
+
+    # Type globals
+    _ENCODING: str = "utf-8"
+
+    def __init__(self, connection: redis.asyncio.Redis, key: str, master: typing.Optional[str] = None) -> None:
+        # Store redis connection
+        self._connection = connection
+
+        # Store structure information
+        self._key = key
+        self._master = master or key
+
+    async def initialize(self, value: typing.Any) -> None:
+        raise NotImplementedError()
+
+    async def deinitialize(self) -> None:
+        raise NotImplementedError()
+
+    def _encode(self, value: typing.Any) -> str:
+        # Return the representation of the object
+        return repr(value)
+
+    def _decode(self, value: typing.Union[str, bytes]) -> typing.Any:
+        # Make sure the value is a string
+        if not isinstance(value, str):
+            value = value.decode(self._ENCODING)
+
+        # Evaluate the value literal
+        return ast.literal_eval(value)
+
+    def _fetch_by_identifier(self, identifier: typing.Union[str, bytes]) -> typing.Any:
+        # Make sure the identifier is a string
+        if not isinstance(identifier, str):
+            identifier = identifier.decode(self._ENCODING)
+
+        # Split identifier to item type and encoded value
+        redis_identifier, encoded_item_value = identifier.split(":", 1)
+
+        # Decode the item value
+        decoded_item_value = self._decode(encoded_item_value)
+
+        # Check if the item is a nested hash
+        if redis_identifier == IDENTIFIER_HASH:
+            return AsyncDictionary(self._connection, decoded_item_value, self._master)
+
+        # Check if the item is a nested list
+        if redis_identifier == IDENTIFIER_LIST:
+            return AsyncList(self._connection, decoded_item_value, self._master)
+
+        # Return the decoded value
+        return decoded_item_value
+
+    async def _delete_by_identifier(self, identifier: typing.Union[str, bytes]) -> None:
+        # Fetch the nested object
+        nested_item = self._fetch_by_identifier(identifier)
+
+        # If the item is nested, deconstruct it
+        if isinstance(nested_item, AsyncNested):
+            await nested_item.deinitialize()
+
+    async def _create_identifier_from_value(self, value: typing.Any) -> str:
+        # Check whether the value should be nested as a hash or as a list
+        for redis_identifier, nested_class, convertable_types in ((IDENTIFIER_HASH, AsyncDictionary, (AsyncDictionary, Dictionary, Mapping)), (IDENTIFIER_LIST, AsyncList, (AsyncList, List, list))):
+            # Check if the value is an instance of the current type
+            if not isinstance(value, convertable_types):
+                continue
+
+            # Copy nested objects before storing them
+            if isinstance(value, AsyncNested):
+                value = await value.copy()
+            elif isinstance(value, (Dictionary, List)):
+                value = value.copy()
+
+            # Create a new nested name
+            nested_name = f"{self._master}:{os.urandom(10).hex()}"
+
+            # Create and initialize the nested instance
+            nested_instance: AsyncNested = nested_class(self._connection, nested_name, self._master)
+            await nested_instance.initialize(value)
+
+            # Return the nested identifier
+            return f"{redis_identifier}:{self._encode(nested_name)}"
+
+        # Return the regular value identifier
+        return f":{self._encode(value)}"
+
+    async def _copy_value(self, value: typing.Any) -> typing.Any:
+        # Copy nested objects
+        if isinstance(value, AsyncNested):
+            return await value.copy()
+
+        # Return regular values as-is
+        return value
+
+    async def copy(self) -> typing.Any:
+        raise NotImplementedError()
+
+
+class AsyncDictionary(AsyncNested):
+
+    # Copy type - the type used when calling copy
+    _COPY_TYPE: typing.Type[typing.MutableMapping[typing.Any, typing.Any]] = dict
+
+    async def initialize(self, value: typing.Mapping[typing.Any, typing.Any]) -> None:
+        # De-initialize before initializing
+        await self.deinitialize()
+
+        # Update the dictionary
+        await self.update(value)
+
+    async def deinitialize(self) -> None:
+        # Clear the dictionary
+        await self.clear()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._key!r})"
+
+    async def get(self, key: typing.Any, default: typing.Any = None) -> typing.Any:
+        # Fetch the identifier from the hash
+        identifier = await self._connection.hget(self._key, self._encode(key))
+
+        # If the response is empty, item does not exist
+        if identifier is None:
+            return default
+
+        # Return the value
+        return self._fetch_by_identifier(identifier)
+
+    async def fetch(self, key: typing.Any) -> typing.Any:
+        # Fetch the identifier from the hash
+        identifier = await self._connection.hget(self._key, self._encode(key))
+
+        # If the response is empty, item does not exist
+        if identifier is None:
+            raise KeyError(key)
+
+        # Return the value
+        return self._fetch_by_identifier(identifier)
+
+    async def set(self, key: typing.Any, value: typing.Any) -> None:
+        # Use the update method to update the item
+        await self.update({key: value})
+
+    async def delete(self, key: typing.Any) -> None:
+        # Fetch the identifier from the hash
+        identifier = await self._connection.hget(self._key, self._encode(key))
+
+        # If the response is empty, item does not exist
+        if identifier is None:
+            raise KeyError(key)
+
+        # Delete the key from hash
+        await self._connection.hdel(self._key, self._encode(key))
+
+        # Delete the nested value
+        await self._delete_by_identifier(identifier)
+
+    async def contains(self, key: typing.Any) -> bool:
+        # Make sure key exists in database
+        return bool(await self._connection.hexists(self._key, self._encode(key)))
+
+    async def length(self) -> int:
+        # Fetch the length of the hash
+        return int(await self._connection.hlen(self._key))
+
+    async def keys(self) -> typing.List[typing.Any]:
+        # Fetch and decode all hash keys
+        return [self._decode(encoded_key) for encoded_key in await self._connection.hkeys(self._key)]
+
+    async def items(self) -> typing.List[typing.Tuple[typing.Any, typing.Any]]:
+        # Fetch all of the raw items at once
+        raw_mapping = await self._connection.hgetall(self._key)
+
+        # Decode all of the items
+        return [(self._decode(encoded_key), self._fetch_by_identifier(identifier)) for encoded_key, identifier in raw_mapping.items()]
+
+    async def values(self) -> typing.List[typing.Any]:
+        # Return the values of all items
+        return [value for _, value in await self.items()]
+
+    async def __aiter__(self) -> typing.AsyncIterator[typing.Any]:
+        # Loop over all object keys
+        for key in await self.keys():
+            yield key
+
+    async def update(self, other: typing.Any = (), /, **kwargs: typing.Any) -> None:
+        # Add values from "other" to "kwargs", since kwargs is a dictionary
+        if other:
+            kwargs.update(other)
+
+        # If there is nothing to update, return
+        if not kwargs:
+            return
+
+        # Fetch the original identifiers - used for future deletion
+        original_identifiers = await self._connection.hmget(self._key, [self._encode(key) for key in kwargs])
+
+        # Create new identifiers for all values
+        mapping = {self._encode(key): await self._create_identifier_from_value(value) for key, value in kwargs.items()}
+
+        # Now set all of the new identifiers in one go using hset with a mapping
+        await self._connection.hset(self._key, mapping=mapping)
+
+        # Loop over original identifiers and delete them
+        for original_identifier in original_identifiers:
+            # Check if the original identifier was even defined
+            if original_identifier is None:
+                continue
+
+            # Delete the value by the identifier
+            await self._delete_by_identifier(original_identifier)
+
+    async def setdefault(self, key: typing.Any, default: typing.Any = None) -> typing.Any:
+        # Fetch the identifier from the hash
+        identifier = await self._connection.hget(self._key, self._encode(key))
+
+        # If the key already exists, return it
+        if identifier is not None:
+            return self._fetch_by_identifier(identifier)
+
+        # Create the item identifier
+        identifier = await self._create_identifier_from_value(default)
+
+        # Try inserting the identifier atomically
+        if await self._connection.hsetnx(self._key, self._encode(key), identifier):
+            return self._fetch_by_identifier(identifier)
+
+        # Delete the unused identifier
+        await self._delete_by_identifier(identifier)
+
+        # Since our first check, the value was added
+        return await self.fetch(key)
+
+    async def setdefaults(self, other: typing.Any = (), /, **kwargs: typing.Any) -> typing.Mapping[typing.Any, typing.Any]:
+        # Add values from "other" to "kwargs", since kwargs is a dictionary
+        if other:
+            kwargs.update(other)
+
+        # Create the output object
+        output = self._COPY_TYPE()
+
+        # Loop over all items
+        for key, value in kwargs.items():
+            # Try setting a default value and update the output mapping
+            output[key] = await self.setdefault(key, value)
+
+        # Return the output mapping
+        return output
+
+    async def getdefaults(self, other: typing.Any = (), /, **kwargs: typing.Any) -> typing.Mapping[typing.Any, typing.Any]:
+        # Add values from "other" to "kwargs", since kwargs is a dictionary
+        if other:
+            kwargs.update(other)
+
+        # Create the output object
+        output = self._COPY_TYPE()
+
+        # If there is nothing to fetch, return
+        if not kwargs:
+            return output
+
+        # Create a list of the keys to preserve the order
+        keys = list(kwargs)
+
+        # Use hmget to get multiple values at once
+        identifiers = await self._connection.hmget(self._key, [self._encode(key) for key in keys])
+
+        # Loop over identifiers
+        for key, identifier in zip(keys, identifiers):
+            # Check if a default value should be used
+            output[key] = kwargs[key] if identifier is None else self._fetch_by_identifier(identifier)
+
+        # Return the output mapping
+        return output
+
+    async def increment(self, key: typing.Any, amount: int = 1) -> int:
+        # Increment the value server-side in a single round trip
+        return int(await register_script(self._connection, INCREMENT_SCRIPT)(keys=[self._key], args=[self._encode(key), amount]))
+
+    async def decrement(self, key: typing.Any, amount: int = 1) -> int:
+        # Decrement using a negative increment
+        return await self.increment(key, -amount)
+
+    async def set_if_absent(self, key: typing.Any, value: typing.Any) -> bool:
+        # Create the value identifier
+        identifier = await self._create_identifier_from_value(value)
+
+        # Try inserting the identifier atomically
+        if await self._connection.hsetnx(self._key, self._encode(key), identifier):
+            return True
+
+        # Delete the unused identifier
+        await self._delete_by_identifier(identifier)
+
+        # The key already exists
+        return False
+
+    async def compare_and_swap(self, key: typing.Any, expected: typing.Any, value: typing.Any) -> bool:
+        # Create the value identifier
+        identifier = await self._create_identifier_from_value(value)
+
+        # Try swapping the identifier atomically
+        if await register_script(self._connection, COMPARE_AND_SWAP_SCRIPT)(keys=[self._key], args=[self._encode(key), f":{self._encode(expected)}", identifier]):
+            return True
+
+        # Delete the unused identifier
+        await self._delete_by_identifier(identifier)
+
+        # The value did not match
+        return False
+
+    async def append(self, key: typing.Any, value: typing.Any) -> int:
+        # Create the item identifier
+        identifier = await self._create_identifier_from_value(value)
+
+        while True:
+            # Fetch the current list identifier
+            current = await self._connection.hget(self._key, self._encode(key))
+
+            # Create a new list identifier if the list does not exist - the empty list has no key until the item is pushed
+            if current is None:
+                list_identifier = await self._create_identifier_from_value([])
+            else:
+                list_identifier = current if isinstance(current, str) else current.decode(self._ENCODING)
+
+            # Resolve the list, so that its key is passed to the script
+            nested_list = self._fetch_by_identifier(list_identifier)
+            if not isinstance(nested_list, AsyncList):
+                # Delete the unused identifier
+                await self._delete_by_identifier(identifier)
+
+                # The value is not a list
+                raise TypeError("Value is not a list")
+
+            # Append the item server-side and return the new list length, retrying if the value changed meanwhile
+            # pylint: disable-next=protected-access
+            length = int(await register_script(self._connection, APPEND_SCRIPT)(keys=[self._key, nested_list._key], args=[self._encode(key), identifier, list_identifier if current is not None else "", list_identifier]))
+            if length >= 0:
+                return length
+
+    async def clear(self) -> None:
+        # Loop over identifiers and delete nested values
+        for identifier in await self._connection.hvals(self._key):
+            await self._delete_by_identifier(identifier)
+
+        # Delete the hash
+        await self._connection.delete(self._key)
+
+    async def copy(self) -> typing.MutableMapping[typing.Any, typing.Any]:
+        # Create output mapping
+        output = self._COPY_TYPE()
+
+        # Loop over all items and copy nested values
+        for key, value in await self.items():
+            output[key] = await self._copy_value(value)
+
+        # Return the created output
+        return output
+
+
+class AsyncList(AsyncNested):
+
+    # Copy type - the type used when calling copy
+    _COPY_TYPE: typing.Type[typing.MutableSequence[typing.Any]] = list
+
+    async def initialize(self, value: typing.Sequence[typing.Any]) -> None:
+        # De-initialize before initializing
+        await self.deinitialize()
+
+        # Extend the list
+        await self.extend(value)
+
+    async def deinitialize(self) -> None:
+        # Clear the list
+        await self.clear()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._key!r})"
+
+    async def get(self, index: int) -> typing.Any:
+        # Fetch the identifier at the index
+        identifier = await self._connection.lindex(self._key, index)
+
+        # If the response is empty, item does not exist
+        if identifier is None:
+            raise IndexError(index)
+
+        # Return the value
+        return self._fetch_by_identifier(identifier)
+
+    async def set(self, index: int, value: typing.Any) -> None:
+        # Fetch the original identifier
+        original_identifier = await self._connection.lindex(self._key, index)
+
+        # If the response is empty, item does not exist
+        if original_identifier is None:
+            raise IndexError(index)
+
+        # Set the new identifier
+        await self._connection.lset(self._key, index, await self._create_identifier_from_value(value))
+
+        # Delete the original nested value
+        await self._delete_by_identifier(original_identifier)
+
+    async def append(self, value: typing.Any) -> None:
+        # Push the value to the end of the list
+        await self._connection.rpush(self._key, await self._create_identifier_from_value(value))
+
+    async def extend(self, values: typing.Iterable[typing.Any]) -> None:
+        # Create identifiers for all of the values
+        identifiers = [await self._create_identifier_from_value(value) for value in values]
+
+        # Push all of the values at once
+        if identifiers:
+            await self._connection.rpush(self._key, *identifiers)
+
+    async def pop(self, index: int = -1) -> typing.Any:
+        # Only the edges of the list can be popped atomically
+        if index not in (0, -1):
+            raise IndexError(index)
+
+        # Pop the identifier from the list
+        identifier = await (self._connection.lpop(self._key) if index == 0 else self._connection.rpop(self._key))
+
+        # If the response is empty, the list is empty
+        if identifier is None:
+            raise IndexError(index)
+
+        # Copy the value before deleting it
+        value = await self._copy_value(self._fetch_by_identifier(identifier))
+
+        # Delete the nested value
+        await self._delete_by_identifier(identifier)
+
+        # Return the value
+        return value
+
+    async def length(self) -> int:
+        # Fetch the list length
+        return int(await self._connection.llen(self._key))
+
+    async def values(self) -> typing.List[typing.Any]:
+        # Fetch all identifiers at once and decode them
+        return [self._fetch_by_identifier(identifier) for identifier in await self._connection.lrange(self._key, 0, -1)]
+
+    async def __aiter__(self) -> typing.AsyncIterator[typing.Any]:
+        # Loop over all values
+        for value in await self.values():
+            yield value
+
+    async def clear(self) -> None:
+        # Loop over identifiers and delete nested values
+        for identifier in await self._connection.lrange(self._key, 0, -1):
+            await self._delete_by_identifier(identifier)
+
+        # Delete the list
+        await self._connection.delete(self._key)
+
+    async def copy(self) -> typing.MutableSequence[typing.Any]:
+        # Create output sequence
+        output = self._COPY_TYPE()
+
+        # Loop over all values and copy nested values
+        for value in await self.values():
+            output.append(await self._copy_value(value))
+
+        # Return the created output
+        return output
+
+
+# Add explicit exports
+__all__ = ["AtomicDictionary", "AsyncNested", "AsyncDictionary", "AsyncList"]
@@ -0,0 +1,219 @@
+import io
+import os
+import sys
+import time
+import heapq
+import types
+import pstats
+import random
+import typing
+import logging
+import cProfile
+import itertools
+import threading
+import contextvars
+import collections
+
+# Fraction of requests to profile - 0 disables sampling, routes can still opt-in using the profile flag
+PROFILE_RATE = float(os.environ.get("PROFILE_RATE", 0))
+
+# Number of profiled requests to keep
+PROFILE_BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", 1024))
+
+# Number of slowest requests to keep cProfile statistics for - 0 disables cProfile
+PROFILE_SLOWEST = int(os.environ.get("PROFILE_SLOWEST", 0))
+
+# Whether cProfile can be limited to the thread that runs the request function - since Python 3.12, cProfile uses sys.monitoring, which covers every thread of the process
+PROFILE_ISOLATED = sys.version_info < (3, 12)
+
+# Number of functions to include in every cProfile dump
+PROFILE_FUNCTIONS = int(os.environ.get("PROFILE_FUNCTIONS", 30))
+
+# Path of the profiling dump endpoint
+PROFILE_PATH = os.environ.get("PROFILE_PATH", "/debug/profile")
+
+# Bearer token required by the profiling dump endpoint - the endpoint is only served if a token is set
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+
+
+class Timings:
+
+    def __init__(self) -> None:
+        # Initialize the phase durations, in order
+        self.phases: typing.Dict[str, float] = {}
+
+        # Store the start time of the current phase
+        self.started = self.marked = time.perf_counter()
+
+        # Initialize the cProfile profile of the request, if captured
+        self.profile: typing.Optional[cProfile.Profile] = None
+
+    def mark(self, phase: str) -> None:
+        # Store the time of the mark
+        marked = time.perf_counter()
+
+        # Add the phase duration, phases might repeat
+        self.phases[phase] = self.phases.get(phase, 0) + marked - self.marked
+
+        # Start the next phase
+        self.marked = marked
+
+    @property
+    def duration(self) -> float:
+        # Return the total duration so far
+        return self.marked - self.started
+
+
+# Timings of the current request, if it is profiled
+TIMINGS: contextvars.ContextVar[typing.Optional[Timings]] = contextvars.ContextVar("timings", default=None)
+
+
+def mark(phase: str) -> None:
+    # Fetch the timings of the current request
+    timings = TIMINGS.get()
+
+    # Mark the phase if the request is profiled
+    if timings is not None:
+        timings.mark(phase)
+
+
+def current_profile() -> typing.Optional[cProfile.Profile]:
+    # Fetch the timings of the current request
+    timings = TIMINGS.get()
+
+    # Return the profile if the request is profiled
+    return timings.profile if timings is not None else None
+
+
+def profiled_call(function: typing.Callable[..., typing.Any], parameters: typing.Dict[str, typing.Any]) -> typing.Any:
+    # Fetch the profile of the current request
+    profile = current_profile()
+
+    # Call the function as-is if the request is not profiled
+    if profile is None:
+        return function(**parameters)
+
+    # Profile the call in the calling thread - cProfile only profiles the thread it is enabled in
+    profile.enable()
+    try:
+        return function(**parameters)
+    finally:
+        profile.disable()
+
+
+@types.coroutine
+def profile_steps(coroutine: typing.Coroutine[typing.Any, typing.Any, typing.Any], profile: cProfile.Profile) -> typing.Generator[typing.Any, typing.Any, typing.Any]:
+    # Initialize the value and the exception to resume the coroutine with
+    value: typing.Any = None
+    exception: typing.Optional[BaseException] = None
+
+    while True:
+        # Profile the next step of the coroutine only, so that other coroutines running meanwhile are not profiled
+        profile.enable()
+        try:
+            awaited = coroutine.send(value) if exception is None else coroutine.throw(exception)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            profile.disable()
+
+        # Pass the awaited object to the event loop and resume the coroutine with the result
+        try:
+            value, exception = (yield awaited), None
+        except BaseException as error:  # pylint: disable=broad-exception-caught
+            value, exception = None, error
+
+
+def profiled_await(coroutine: typing.Coroutine[typing.Any, typing.Any, typing.Any]) -> typing.Awaitable[typing.Any]:
+    # Fetch the profile of the current request
+    profile = current_profile()
+
+    # Await the coroutine as-is if the request is not profiled
+    if profile is None:
+        return coroutine
+
+    # Profile the steps of the coroutine
+    return profile_steps(coroutine, profile)
+
+
+class Profiler:
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE, slowest: int = PROFILE_SLOWEST) -> None:
+        # Refuse per-request cProfile statistics if they would include other requests and threads
+        if slowest and not PROFILE_ISOLATED:
+            logging.warning("Per-request cProfile statistics are not supported on Python 3.12 and later, only timings are recorded")
+            slowest = 0
+
+        # Store the profiler configuration
+        self.slowest = slowest
+
+        # Initialize the ring buffer of profiled requests
+        self.records: typing.Deque[typing.Dict[str, typing.Any]] = collections.deque(maxlen=size)
+
+        # Initialize the heap of the slowest requests - duration, sequence, record and statistics
+        self.profiles: typing.List[typing.Tuple[float, int, typing.Dict[str, typing.Any], str]] = []
+        self.sequence = itertools.count()
+
+        # Initialize the cProfile lock, only a single profile can be active at a time
+        self.lock = threading.Lock()
+
+    def sample(self, always: bool) -> bool:
+        # Check whether the request should be profiled
+        return always or (PROFILE_RATE > 0 and random.random() < PROFILE_RATE)
+
+    def begin(self) -> typing.Optional[cProfile.Profile]:
+        # Skip cProfile if disabled or if another request is being profiled
+        if not self.slowest or not self.lock.acquire(blocking=False):
+            return None
+
+        # Create the profile - it is enabled only while the request function runs
+        return cProfile.Profile()
+
+    def record(self, path: str, method: str, status_code: int, timings: Timings, profile: typing.Optional[cProfile.Profile]) -> None:
+        # Create the request record
+        record = {"path": path, "method": method, "status": status_code, "time": time.time(), "duration": timings.duration, "phases": timings.phases}
+
+        # Store the record in the ring buffer
+        self.records.append(record)
+
+        # Check whether a profile was captured
+        if profile is None:
+            return
+
+        try:
+            # Keep only the slowest profiles
+            if len(self.profiles) >= self.slowest and timings.duration <= self.profiles[0][0]:
+                return
+
+            # Skip requests that failed before the function was called
+            profile.create_stats()
+            if not profile.stats:  # type: ignore[attr-defined]
+                return
+
+            # Format the profile statistics
+            output = io.StringIO()
+            pstats.Stats(profile, stream=output).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_FUNCTIONS)
+
+            # Store the profile, dropping the fastest one if needed
+            entry = (timings.duration, next(self.sequence), record, output.getvalue())
+            if len(self.profiles) >= self.slowest:
+                heapq.heapreplace(self.profiles, entry)
+            else:
+                heapq.heappush(self.profiles, entry)
+        finally:
+            # Allow other requests to be profiled
+            self.lock.release()
+
+    def dump(self) -> typing.Dict[str, typing.Any]:
+        # Return the profiled requests and the slowest profiles, slowest first
+        return {
+            "requests": list(self.records),
+            "slowest": [{"request": record, "profile": statistics} for _, _, record, statistics in sorted(self.profiles, reverse=True)],
+        }
+
+
+# Profiler of this process
+PROFILER = Profiler()
+
+# Add explicit exports
+__all__ = ["PROFILE_RATE", "PROFILE_PATH", "PROFILE_TOKEN", "Timings", "Profiler", "PROFILER", "mark", "profiled_call", "profiled_await"]
@@ -1,40 +1,199 @@
+import os
+import time
+import hmac
+import random
 import typing
+import asyncio
+import logging
+import hashlib
 import inspect
+import tempfile
+import functools
+import threading
+import contextlib
+import contextvars
+import email.utils
+import collections
 import collections.abc
+import concurrent.futures
 
 # Import starlette utilities
-from starlette.routing import BaseRoute, Mount, Route, WebSocketRoute
+from starlette import status
+from starlette.types import Message, Send
+from starlette.routing import BaseRoute, Mount, Route, WebSocketRoute, compile_path
 from starlette.requests import Request
 from starlette.responses import Response, JSONResponse, PlainTextResponse
-from starlette.websockets import WebSocket
+from starlette.websockets import WebSocket, WebSocketDisconnect
 from starlette.staticfiles import StaticFiles
+from starlette.middleware import Middleware
 from starlette.applications import Starlette
-from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.formparsers import MultiPartParser, MultiPartException
+from starlette.datastructures import Headers, UploadFile
 
 # Import typing utilities
-from runtypes import cast_type_hints, check_type_hints
+from runtypes import Any
 
-# Import debug utilities
-from webhood.constants import DEBUG
+# Import debug utilities and slow consumer policies
+from webhood.constants import DEBUG, POLICIES, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_COALESCE_LATEST
+
+# Import codec utilities
+from webhood.codecs import MIMETYPE_JSON, JSON_CODEC, Codec, negotiate
+
+# Import cache utilities
+from webhood.cache import MISSING, Cache
+
+# Import static file utilities
+from webhood.static import MemoryStaticFiles
+
+# Import compression utilities
+from webhood.compression import COMPRESSION, CompressionMiddleware, compression_statistics
+
+# Import metrics utilities
+from webhood import metrics
+
+# Import profiling utilities
+from webhood.profiling import PROFILE_RATE, PROFILE_PATH, PROFILE_TOKEN, PROFILER, TIMINGS, Timings, mark, profiled_call, profiled_await
 
 # Type checking prefix
 PREFIX_REQUIRED = "type_"
 PREFIX_OPTIONAL = "optional_"
 
-# Header for content parsing
+# Headers for content parsing and negotiation
+HEADER_ACCEPT = "Accept"
 HEADER_CONTENT_TYPE = "Content-Type"
+HEADER_CONTENT_LENGTH = "Content-Length"
+HEADER_RETRY_AFTER = "Retry-After"
+
+# Headers for response caching
+HEADER_ETAG = "ETag"
+HEADER_LAST_MODIFIED = "Last-Modified"
+HEADER_CACHE_CONTROL = "Cache-Control"
+HEADER_IF_NONE_MATCH = "If-None-Match"
+HEADER_IF_MODIFIED_SINCE = "If-Modified-Since"
+
+# Headers for endpoint authentication
+HEADER_AUTHORIZATION = "Authorization"
+HEADER_WWW_AUTHENTICATE = "WWW-Authenticate"
+
+# Cached responses are always revalidated, so that invalidations are visible immediately
+CACHE_CONTROL_REVALIDATE = "no-cache"
 
 # Mime-types for content parsing
-MIMETYPE_JSON = "application/json"
 MIMETYPE_DEFAULT = "application/octet-stream"
 MIMETYPE_SIMPLE_FORM = "application/x-www-form-urlencoded"
 MIMETYPE_MULTIPART_FORM = "multipart/form-data"
 
+# Content parameters for raw bodies - read into memory, streamed or spooled to a file
+PARAMETER_CONTENT_TYPE = "content_type"
+PARAMETER_CONTENT_DATA = "content_data"
+PARAMETER_CONTENT_STREAM = "content_stream"
+PARAMETER_CONTENT_FILE = "content_file"
+
+# All of the content parameters
+PARAMETERS_CONTENT = {PARAMETER_CONTENT_DATA, PARAMETER_CONTENT_STREAM, PARAMETER_CONTENT_FILE, PARAMETER_CONTENT_TYPE}
+
+# Maximal request body size - a size of 0 disables the limit
+MAX_BODY_SIZE = int(os.environ.get("MAX_BODY_SIZE", 16 * 1024 * 1024))
+
+# Size above which uploaded files are spooled to disk
+UPLOAD_SPOOL_SIZE = int(os.environ.get("UPLOAD_SPOOL_SIZE", 1024 * 1024))
+
+# Handler thread pool configuration - synchronous functions are called in the pool, a queue size of 0 disables the limit
+HANDLER_THREADS = int(os.environ.get("HANDLER_THREADS", 32))
+HANDLER_QUEUE_SIZE = int(os.environ.get("HANDLER_QUEUE_SIZE", 256))
+
+# Whether to serve static files from memory, precompressed
+STATIC_MEMORY = bool(int(os.environ.get("STATIC_MEMORY", 1)))
+
+# Socket send queue configuration - a size of 0 disables the queue
+SOCKET_QUEUE_SIZE = int(os.environ.get("SOCKET_QUEUE_SIZE", 256))
+SOCKET_QUEUE_POLICY = os.environ.get("SOCKET_QUEUE_POLICY", POLICY_DROP_OLDEST)
+
+# Maximal time to wait for queued messages to be sent before closing a socket
+SOCKET_FLUSH_TIMEOUT = float(os.environ.get("SOCKET_FLUSH_TIMEOUT", 1))
+
+# Close code sent to disconnected slow consumers (try again later)
+CODE_SLOW_CONSUMER = 1013
+
+# Maximal number of received messages waiting for the socket function - further messages are dropped until the function receives, 0 disables the limit
+SOCKET_RECEIVE_QUEUE_SIZE = int(os.environ.get("SOCKET_RECEIVE_QUEUE_SIZE", 256))
+
+# Path of the readiness endpoint, which succeeds once the worker started and until it drains
+READY_PATH = os.environ.get("READY_PATH", "/ready")
+
+# Close code sent to sockets of draining workers (service restart, reconnect)
+CODE_RECONNECT = 1012
+
+# Maximal time for open sockets to finish once a worker drains - remaining sockets are closed at random times within it
+SOCKET_DRAIN_TIMEOUT = float(os.environ.get("SOCKET_DRAIN_TIMEOUT", 10))
+
+# Maximal random delay before clients reconnect to another worker, sent as the close reason in milliseconds
+SOCKET_RECONNECT_JITTER = float(os.environ.get("SOCKET_RECONNECT_JITTER", 5))
+
 # Function type for decorators
 Function = typing.TypeVar("Function", bound=typing.Callable[..., typing.Any])
 
 
-async def gather_parameters(request_or_websocket: typing.Union[Request, WebSocket]) -> typing.Dict[str, typing.Any]:
+def limit_body(request: Request, max_body_size: int) -> Request:
+    # A size of 0 disables the limit
+    if not max_body_size:
+        return request
+
+    # Reject bodies that are declared to be too large before reading them
+    content_length = request.headers.get(HEADER_CONTENT_LENGTH, "")
+    if content_length.isdigit() and int(content_length) > max_body_size:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    # Initialize the received body size
+    received = 0
+
+    async def receive() -> Message:
+        nonlocal received
+
+        # Receive the next message
+        message = await request.receive()
+
+        # Count the received body size and stop reading once it exceeds the limit
+        received += len(message.get("body", b""))
+        if received > max_body_size:
+            raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # Return the message
+        return message
+
+    # Create a request that enforces the limit while reading
+    return Request(request.scope, receive=receive)
+
+
+async def spool_body(request: Request, content_type: str) -> UploadFile:
+    # Create the upload file - kept in memory until it exceeds the spool size
+    upload = UploadFile(tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE), size=0, headers=Headers({HEADER_CONTENT_TYPE: content_type}))
+
+    try:
+        # Write the body incrementally
+        async for chunk in request.stream():
+            await upload.write(chunk)
+
+        # Rewind the file for reading
+        await upload.seek(0)
+    except BaseException:
+        # Close the file on failures
+        await upload.close()
+        raise
+
+    # Return the upload file
+    return upload
+
+
+async def close_uploads(parameters: typing.Dict[str, typing.Any]) -> None:
+    # Close all of the uploaded files, so that spooled files are removed
+    for value in parameters.values():
+        if isinstance(value, UploadFile):
+            await value.close()
+
+
+async def gather_parameters(request_or_websocket: typing.Union[Request, WebSocket], names: typing.Optional[typing.Collection[str]] = None, max_body_size: int = MAX_BODY_SIZE) -> typing.Dict[str, typing.Any]:
     # Create a dictionary to store all of the paremters
     parameters: typing.Dict[str, typing.Any] = {}
 
@@ -50,6 +209,10 @@ async def gather_parameters(request_or_websocket: typing.Union[Request, WebSocke
     if not isinstance(request_or_websocket, Request):
         return parameters
 
+    # Only parse data if some of the required parameters are still missing
+    if names is not None and all(name in parameters for name in names):
+        return parameters
+
     # Only parse data if content-type header was provided
     if HEADER_CONTENT_TYPE not in request_or_websocket.headers:
         return parameters
@@ -57,10 +220,33 @@ async def gather_parameters(request_or_websocket: typing.Union[Request, WebSocke
     # Fetch the request content type
     content_type = request_or_websocket.headers.get(HEADER_CONTENT_TYPE, MIMETYPE_DEFAULT)
 
+    # Enforce the maximal body size while reading
+    request = limit_body(request_or_websocket, max_body_size)
+
     # If the content is a form body, parse it
-    if content_type == MIMETYPE_SIMPLE_FORM or content_type.startswith(MIMETYPE_MULTIPART_FORM):
+    if content_type.startswith(MIMETYPE_MULTIPART_FORM):
+        # Create the multipart parser, spooling large files to disk
+        form_parser = MultiPartParser(request.headers, request.stream())
+        form_parser.max_file_size = UPLOAD_SPOOL_SIZE
+
+        try:
+            # Fetch the form body
+            form_object = await form_parser.parse()
+        except MultiPartException as exception:
+            raise TypeError(exception.message) from exception
+
+        # Update the request parameters using the form body
+        for key, value in form_object.items():
+            # Close files that are not required by the function
+            if names is not None and key not in names:
+                if isinstance(value, UploadFile):
+                    await value.close()
+                continue
+
+            parameters.setdefault(key, value)
+    elif content_type == MIMETYPE_SIMPLE_FORM:
         # Fetch the form body
-        form_object = await request_or_websocket.form()
+        form_object = await request.form()
 
         # Make sure form object is a dictionary
         if not isinstance(form_object, collections.abc.Mapping):
@@ -68,10 +254,14 @@ async def gather_parameters(request_or_websocket: typing.Union[Request, WebSocke
 
         # Update the request parameters using the form body
         for key, value in form_object.items():
+            # Skip keys that are not required by the function
+            if names is not None and key not in names:
+                continue
+
             parameters.setdefault(key, value)
     elif content_type == MIMETYPE_JSON:
-        # Fetch the JSON body
-        json_object = await request_or_websocket.json()
+        # Fetch and parse the JSON body
+        json_object = JSON_CODEC.loads(await request.body())
 
         # Make sure JSON object is a dictionary
         if not isinstance(json_object, dict):
@@ -79,10 +269,23 @@ async def gather_parameters(request_or_websocket: typing.Union[Request, WebSocke
 
         # Update the request parameters using the JSON body
         for key, value in json_object.items():
+            # Skip keys that are not required by the function
+            if names is not None and key not in names:
+                continue
+
             parameters.setdefault(key, value)
+    elif names is not None and PARAMETERS_CONTENT.isdisjoint(names):
+        # Skip reading the content, since the function does not require it
+        pass
+    elif names is not None and PARAMETER_CONTENT_STREAM in names:
+        # Provide the content stream, so that the function consumes the body incrementally
+        parameters.update(content_type=content_type, content_stream=request.stream())
+    elif names is not None and PARAMETER_CONTENT_FILE in names:
+        # Provide the content file, spooled to disk when large
+        parameters.update(content_type=content_type, content_file=await spool_body(request, content_type))
     else:
         # Fetch the content data
-        content_data = await request_or_websocket.body()
+        content_data = await request.body()
 
         # Provide the content parameters
         parameters.update(content_type=content_type, content_data=content_data)
@@ -91,6 +294,517 @@ async def gather_parameters(request_or_websocket: typing.Union[Request, WebSocke
     return parameters
 
 
+class Parser:
+
+    def __init__(self, function: typing.Callable[..., typing.Any], cast: bool, check: bool) -> None:
+        # Store the parsing configuration
+        self.cast = cast
+        self.check = check
+
+        # Initialize the parameter fields - name, type, default, whether the type is a class and whether the type is Any
+        self.fields: typing.List[typing.Tuple[str, typing.Any, typing.Any, bool, bool]] = []
+
+        # Initialize whether undeclared parameters are accepted
+        self.variable = False
+
+        # Resolve the function signature once
+        for name, parameter in inspect.signature(function).parameters.items():
+            # Variable keyword parameters accept all undeclared parameters
+            if parameter.kind == inspect.Parameter.VAR_KEYWORD:
+                self.variable = True
+                continue
+
+            # Variable positional parameters cannot be passed
+            if parameter.kind == inspect.Parameter.VAR_POSITIONAL:
+                continue
+
+            # Resolve the parameter type - Any as default, annotation if defined
+            parameter_type = Any if parameter.annotation is inspect.Parameter.empty else parameter.annotation
+
+            # Store the field
+            self.fields.append((name, parameter_type, parameter.default, isinstance(parameter_type, type), parameter_type is Any))
+
+        # Store the declared parameter names
+        self.names = {field[0] for field in self.fields}
+
+    def parse(self, values: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+        # Create the output dictionary
+        output: typing.Dict[str, typing.Any] = {}
+
+        # Loop over all declared parameters
+        for name, parameter_type, default, is_class, is_any in self.fields:
+            # Fetch the value - provided, default or None
+            if name in values:
+                value = values[name]
+            elif default is not inspect.Parameter.empty:
+                value = default
+            elif self.cast or self.check:
+                value = None
+            else:
+                # Missing parameters are reported by the function call
+                continue
+
+            # Untyped values are passed as-is
+            if is_any:
+                output[name] = value
+                continue
+
+            # Cast the value if it is not of the required type
+            if self.cast and not (is_class and isinstance(value, parameter_type)):
+                value = parameter_type(value)
+
+            # Check the value type
+            if self.check and not isinstance(value, parameter_type):
+                raise TypeError(f"Argument {name!r} is not an instance of {parameter_type!r}")
+
+            # Store the value
+            output[name] = value
+
+        # Pass undeclared values to variable keyword parameters
+        if self.variable:
+            for name, value in values.items():
+                output.setdefault(name, value)
+
+        # Return the parsed parameters
+        return output
+
+
+def cached_response(request: Request, content: bytes, media_type: str, etag: str, modified: float) -> Response:
+    # Create the validator headers
+    headers = {HEADER_ETAG: etag, HEADER_LAST_MODIFIED: email.utils.formatdate(modified, usegmt=True), HEADER_CACHE_CONTROL: CACHE_CONTROL_REVALIDATE}
+
+    # Fetch the conditional headers
+    if_none_match = request.headers.get(HEADER_IF_NONE_MATCH)
+    if_modified_since = request.headers.get(HEADER_IF_MODIFIED_SINCE)
+
+    # Initialize whether the client already has the content
+    not_modified = False
+
+    if if_none_match is not None:
+        # Parse the entity tags
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+
+        # Compare the entity tags, ignoring weak prefixes
+        not_modified = any((tag[2:] if tag.startswith("W/") else tag) in (etag, "*") for tag in tags)
+    elif if_modified_since is not None:
+        # Compare the modification times, ignoring invalid dates
+        with contextlib.suppress(TypeError, ValueError):
+            not_modified = int(modified) <= email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+
+    # Respond without content if the client already has it
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Respond with the cached content
+    return Response(content, headers=headers, media_type=media_type)
+
+
+def exception_status(exception: BaseException) -> int:
+    # HTTP exceptions carry their own status
+    if isinstance(exception, HTTPException):
+        return exception.status_code
+
+    # Type errors are bad requests
+    if isinstance(exception, TypeError):
+        return status.HTTP_400_BAD_REQUEST
+
+    # Other exceptions are internal errors
+    return status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def measure_endpoint(path: str, endpoint: typing.Callable[[Request], typing.Awaitable[Response]]) -> typing.Callable[[Request], typing.Awaitable[Response]]:
+
+    async def wrapper(request: Request) -> Response:
+        # Make sure the metrics of this worker are published
+        metrics.start()
+
+        # Count the request in flight
+        metrics.REQUESTS_IN_FLIGHT.inc(path)
+
+        # Initialize the response status
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        # Store the start time
+        started = time.perf_counter()
+
+        try:
+            # Handle the request
+            response = await endpoint(request)
+
+            # Store the response status
+            status_code = response.status_code
+
+            # Return the response
+            return response
+        except BaseException as exception:
+            # Store the status of the exception response
+            status_code = exception_status(exception)
+            raise
+        finally:
+            # Update the request metrics
+            metrics.REQUESTS_IN_FLIGHT.dec(path)
+            metrics.REQUEST_DURATION.observe(time.perf_counter() - started, path, request.method)
+            metrics.REQUESTS.inc(path, request.method, str(status_code))
+
+    # Return the wrapper
+    return wrapper
+
+
+def profile_endpoint(path: str, endpoint: typing.Callable[[Request], typing.Awaitable[Response]], always: bool) -> typing.Callable[[Request], typing.Awaitable[Response]]:
+
+    async def wrapper(request: Request) -> Response:
+        # Handle requests that are not sampled as-is
+        if not PROFILER.sample(always):
+            return await endpoint(request)
+
+        # Create the request timings, phases are marked by the endpoint
+        timings = Timings()
+        token = TIMINGS.set(timings)
+
+        # Create a cProfile profile as needed, which is enabled around the function call
+        profile = timings.profile = PROFILER.begin()
+
+        # Initialize the response status
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        try:
+            # Handle the request
+            response = await endpoint(request)
+
+            # Store the response status
+            status_code = response.status_code
+
+            # Return the response
+            return response
+        except BaseException as exception:
+            # Store the status of the exception response
+            status_code = exception_status(exception)
+            raise
+        finally:
+            # Mark the response phase - encoding and caching
+            timings.mark("respond")
+
+            # Stop timing the request
+            TIMINGS.reset(token)
+
+            # Record the request
+            PROFILER.record(path, request.method, status_code, timings, profile)
+
+    # Return the wrapper
+    return wrapper
+
+
+async def call_hook(function: typing.Callable[[], typing.Any]) -> None:
+    # Call the function, awaiting coroutine functions
+    result = function()
+    if inspect.isawaitable(result):
+        await result
+
+
+def authorize(request: Request, token: str) -> None:
+    # Make sure the client holds the bearer token
+    if not hmac.compare_digest(request.headers.get(HEADER_AUTHORIZATION, "").encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, headers={HEADER_WWW_AUTHENTICATE: "Bearer"})
+
+
+async def profile_dump_endpoint(request: Request) -> Response:
+    # Make sure the client holds the profiling token
+    authorize(request, PROFILE_TOKEN)
+
+    # Respond with the profiled requests of this worker
+    return EncodedResponse(PROFILER.dump())
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    # Make sure the client holds the metrics token, if one is configured
+    if metrics.METRICS_TOKEN:
+        authorize(request, metrics.METRICS_TOKEN)
+
+    # Respond with the metrics of all workers
+    return PlainTextResponse(await metrics.collect(), media_type=metrics.MIMETYPE_METRICS)
+
+
+class EncodedResponse(Response):
+
+    def __init__(self, content: typing.Any, status_code: int = 200, headers: typing.Optional[typing.Mapping[str, str]] = None, codec: Codec = JSON_CODEC) -> None:
+        # Store the codec before rendering
+        self.codec = codec
+
+        # Initialize the response
+        super().__init__(content, status_code, headers, codec.media_type)
+
+    def render(self, content: typing.Any) -> bytes:
+        # Encode the content using the codec
+        return self.codec.dumps(content)
+
+
+class HandlerPool:
+
+    def __init__(self, threads: int, queue_size: int) -> None:
+        # Store the pool configuration
+        self.threads = threads
+        self.queue_size = queue_size
+
+        # Initialize the executor - created on first use, so that forked processes do not share it
+        self.executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+        # Initialize the lock, since counters are updated from the pool threads
+        self.lock = threading.Lock()
+
+        # Initialize the counters
+        self.pending = 0
+        self.active = 0
+        self.peak = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def call(self, function: typing.Callable[..., typing.Any], parameters: typing.Dict[str, typing.Any]) -> typing.Any:
+        # Count the active call
+        with self.lock:
+            self.active += 1
+
+        try:
+            # Call the function, profiling it in this thread as needed
+            return profiled_call(function, parameters)
+        finally:
+            # Count the completed call
+            with self.lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(self, function: typing.Callable[..., typing.Any], parameters: typing.Dict[str, typing.Any]) -> typing.Any:
+        # Reject calls once the queue is full, so that overloaded workers respond quickly
+        if self.queue_size and self.pending >= self.threads + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, headers={HEADER_RETRY_AFTER: "1"})
+
+        # Create the executor as needed
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="handler")
+
+        # Count the pending call
+        self.pending += 1
+        self.peak = max(self.peak, self.pending)
+
+        try:
+            # Call the function in the pool, keeping the context variables
+            return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(contextvars.copy_context().run, self.call, function, parameters))
+        finally:
+            # Release the pending call
+            self.pending -= 1
+
+    def statistics(self) -> typing.Dict[str, int]:
+        # Return the pool saturation counters
+        return {
+            "threads": self.threads,
+            "active": self.active,
+            "queued": max(self.pending - self.active, 0),
+            "peak": self.peak,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+class SendQueue:
+
+    def __init__(self, send: Send, size: int, policy: str, dropped: typing.Callable[[int], None]) -> None:
+        # Store the underlying send function
+        self._send = send
+
+        # Store the queue configuration
+        self.size = size
+        self.policy = policy
+
+        # Store the drop counting callback
+        self._dropped = dropped
+
+        # Initialize the message queue
+        self.messages: typing.Deque[Message] = collections.deque()
+
+        # Initialize the queue state events
+        self.available = asyncio.Event()
+        self.drained = asyncio.Event()
+
+        # Initialize the sender task and failure
+        self.sender: typing.Optional[asyncio.Task] = None
+        self.failure: typing.Optional[BaseException] = None
+
+        # Initialize the counters
+        self.sent = 0
+        self.dropped = 0
+
+    def drop(self, amount: int) -> None:
+        # Update the drop counters
+        self.dropped += amount
+        self._dropped(amount)
+
+    async def send(self, message: Message) -> None:
+        # Raise sender failures so that the function stops sending
+        if self.failure is not None:
+            raise self.failure
+
+        # Control messages (accept, close) are sent directly, after flushing
+        if message["type"] != "websocket.send":
+            # Flush the queue
+            await self.flush()
+
+            # Send the message
+            await self._send(message)
+
+            # Nothing more to do
+            return
+
+        # Make sure the sender is running
+        if self.sender is None:
+            self.sender = asyncio.ensure_future(self.drain())
+
+        # Apply the slow consumer policy if the queue is full
+        if len(self.messages) >= self.size:
+            if self.policy == POLICY_DROP_NEWEST:
+                # Drop the new message
+                self.drop(1)
+
+                # Nothing more to do
+                return
+
+            if self.policy == POLICY_DROP_OLDEST:
+                # Drop the oldest message
+                self.messages.popleft()
+                self.drop(1)
+            elif self.policy == POLICY_COALESCE_LATEST:
+                # Drop all queued messages in favor of the latest
+                self.drop(len(self.messages))
+                self.messages.clear()
+            else:
+                # Drop all queued messages
+                self.drop(len(self.messages))
+                self.messages.clear()
+
+                # Disconnect the slow consumer
+                raise WebSocketDisconnect(CODE_SLOW_CONSUMER, "Slow consumer")
+
+        # Queue the message
+        self.messages.append(message)
+
+        # Notify the sender
+        self.drained.clear()
+        self.available.set()
+
+    async def drain(self) -> None:
+        try:
+            # Loop until cancelled
+            while True:
+                # Wait for messages to be queued
+                await self.available.wait()
+
+                # Send all of the queued messages
+                while self.messages:
+                    # Send the oldest message
+                    await self._send(self.messages.popleft())
+
+                    # Bump the send count
+                    self.sent += 1
+
+                # Notify that the queue is empty
+                self.available.clear()
+                self.drained.set()
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            # Store the failure for the next send
+            self.failure = exception
+
+            # Release flushes
+            self.drained.set()
+
+    async def flush(self) -> None:
+        # Nothing to flush if the sender never started
+        if self.sender is None:
+            return
+
+        # Wait for all queued messages to be sent
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.drained.wait(), SOCKET_FLUSH_TIMEOUT)
+
+        # Drop whatever could not be sent in time
+        self.drop(len(self.messages))
+        self.messages.clear()
+
+        # Stop the sender so that it does not interleave with control messages
+        self.sender.cancel()
+        self.sender = None
+
+        # Reset the queue state
+        self.available.clear()
+        self.drained.clear()
+
+    def stop(self) -> None:
+        # Stop the sender, dropping whatever is still queued
+        if self.sender is not None:
+            self.sender.cancel()
+            self.sender = None
+
+
+class Drainer:
+
+    def __init__(self, timeout: float = SOCKET_DRAIN_TIMEOUT) -> None:
+        # Store the drain window
+        self.timeout = timeout
+
+        # Initialize the draining state and the open sockets count
+        self.draining = False
+        self.sockets = 0
+
+        # The events are created lazily, inside the running event loop - events created at import time are bound to a different loop on older interpreters
+        self.notified: typing.Optional[asyncio.Event] = None
+        self.drained: typing.Optional[asyncio.Event] = None
+
+    def open(self) -> None:
+        # Count the open socket
+        self.sockets += 1
+
+    def close(self) -> None:
+        # Count the closed socket
+        self.sockets -= 1
+
+        # Notify once all sockets are closed
+        if not self.sockets and self.drained is not None:
+            self.drained.set()
+
+    async def wait(self) -> None:
+        # Create the draining event on first use
+        if self.notified is None:
+            self.notified = asyncio.Event()
+
+        # Wait for the worker to start draining
+        if not self.draining:
+            await self.notified.wait()
+
+        # Wait for a random time within the drain window, so that clients do not reconnect all at once
+        await asyncio.sleep(random.uniform(0, self.timeout))
+
+    async def drain(self) -> None:
+        # Notify all sockets that the worker is draining
+        self.draining = True
+
+        # Wake up the waiting sockets
+        if self.notified is not None:
+            self.notified.set()
+
+        # Nothing to wait for if all sockets are closed
+        if not self.sockets:
+            return
+
+        # Create the drained event
+        self.drained = asyncio.Event()
+
+        # Wait for all sockets to close, allowing time for their final flush
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.drained.wait(), self.timeout + SOCKET_FLUSH_TIMEOUT)
+
+
+# Socket drainer of this process
+DRAINER = Drainer()
+
+
 class Router:
 
     def __init__(self, root: typing.Optional[str] = None) -> None:
@@ -100,34 +814,183 @@ class Router:
         # Initialize routes
         self.routes: typing.List[BaseRoute] = []
 
-    def socket(self, path: str, /, cast: bool = True, check: bool = True) -> typing.Callable[[Function], Function]:
+        # Initialize the dropped socket message counters
+        self.dropped: typing.Counter[str] = collections.Counter()
+
+        # Initialize the ignored received socket message counters
+        self.ignored: typing.Counter[str] = collections.Counter()
+
+        # Initialize the response compression counters
+        self.compressed: typing.Counter[str] = collections.Counter()
+
+        # Initialize whether any route is always profiled
+        self.profiled = False
+
+        # Initialize the handler thread pool
+        self.pool = HandlerPool(HANDLER_THREADS, HANDLER_QUEUE_SIZE)
+
+        # Initialize the worker startup and shutdown hooks
+        self.startups: typing.List[typing.Callable[[], typing.Any]] = []
+        self.shutdowns: typing.List[typing.Callable[[], typing.Any]] = []
+
+        # Initialize whether the worker finished starting up
+        self.ready = False
+
+        # Update the metrics of the router before they are collected
+        metrics.COLLECTORS.append(self.collect)
+
+    def collect(self) -> None:
+        # Fetch the handler pool counters
+        statistics = self.pool.statistics()
+
+        # Update the handler pool metrics
+        metrics.HANDLER_CALLS.set("active", value=statistics["active"])
+        metrics.HANDLER_CALLS.set("queued", value=statistics["queued"])
+        metrics.HANDLER_REJECTED.set(value=statistics["rejected"])
+
+        # Update the dropped socket message metrics
+        for path, amount in list(self.dropped.items()):
+            metrics.SOCKET_MESSAGES_DROPPED.set(path, value=amount)
+
+        # Update the ignored received socket message metrics
+        for path, amount in list(self.ignored.items()):
+            metrics.SOCKET_MESSAGES_IGNORED.set(path, value=amount)
+
+        # Update the response compression metrics
+        for encoding, counters in compression_statistics(self.compressed).items():
+            metrics.COMPRESSION_RESPONSES.set(encoding, value=counters["responses"])
+
+            # Only compressed responses have sizes and durations
+            if "seconds" in counters:
+                metrics.COMPRESSION_BYTES.set(encoding, "input", value=counters["input_bytes"])
+                metrics.COMPRESSION_BYTES.set(encoding, "output", value=counters["output_bytes"])
+                metrics.COMPRESSION_SECONDS.set(encoding, value=counters["seconds"])
+
+    def socket(self, path: str, /, cast: bool = True, check: bool = True, queue_size: int = SOCKET_QUEUE_SIZE, queue_policy: str = SOCKET_QUEUE_POLICY) -> typing.Callable[[Function], Function]:
         # Create a decorator function
         def decorator(function: Function) -> Function:
             # Make sure the function is a coroutine function
             assert inspect.iscoroutinefunction(function), "Socket routes must be async"
 
+            # Make sure the slow consumer policy is valid
+            assert queue_policy in POLICIES, f"Socket queue policy must be one of {POLICIES}"
+
+            # Compile the parameter parser
+            parser = Parser(function, cast, check)
+
+            # Create the drop counting callback
+            def dropped(amount: int) -> None:
+                self.dropped[path] += amount
+
             # Create the request endpoint function
-            async def endpoint(websocket: WebSocket) -> None:
+            async def endpoint(connection: WebSocket) -> None:
+                # Reject new sockets once the worker is draining, so that clients reconnect to another worker
+                if DRAINER.draining:
+                    await connection.close(CODE_RECONNECT, str(int(SOCKET_RECONNECT_JITTER * 1000)))
+                    return
+
+                # Create a bounded queue for messages received from the client
+                messages: asyncio.Queue = asyncio.Queue(SOCKET_RECEIVE_QUEUE_SIZE)
+
+                # Create a watcher that forwards client messages and notices disconnections
+                async def watch() -> None:
+                    while True:
+                        # Receive the next message from the server
+                        # pylint: disable-next=protected-access
+                        message = await connection._receive()
+
+                        # Stop watching once the client disconnects - the function is cancelled, so the message may be skipped if the queue is full
+                        if message["type"] == "websocket.disconnect":
+                            with contextlib.suppress(asyncio.QueueFull):
+                                messages.put_nowait(message)
+                            return
+
+                        # Drop the message if the function does not keep up with the client, or does not receive at all
+                        if messages.full():
+                            self.ignored[path] += 1
+                            continue
+
+                        # Forward the message to the function
+                        messages.put_nowait(message)
+
+                # Fetch the underlying send function
+                # pylint: disable-next=protected-access
+                send = connection._send
+
+                # Create a bounded send queue so that slow clients do not block the function
+                queue: typing.Optional[SendQueue] = None
+                if queue_size > 0:
+                    queue = SendQueue(send, queue_size, queue_policy, dropped)
+                    send = queue.send
+
+                # Create the websocket that is passed to the function
+                websocket = WebSocket(connection.scope, receive=messages.get, send=send)
+
                 # Create a dictionary to store all of the paremters
                 parameters = await gather_parameters(websocket)
 
                 # Overwrite the websocket parameter
                 parameters.update(websocket=websocket)
 
-                if cast:
-                    # Cast all parameters and overwrite the parameters dictionary
-                    parameters = cast_type_hints(function, [websocket], parameters)
+                # Cast and check the parameters using the precompiled parser
+                parameters = parser.parse(parameters)
+
+                # Initialize the close code
+                code = status.WS_1000_NORMAL_CLOSURE
+
+                # Start the watcher, the function and the drain waiter
+                watcher = asyncio.ensure_future(watch())
+                handler = asyncio.ensure_future(function(**parameters))
+                drainer = asyncio.ensure_future(DRAINER.wait())
+
+                # Make sure the metrics of this worker are published
+                metrics.start()
 
-                if check:
-                    # Check all the parameters against the types
-                    check_type_hints(function, [websocket], parameters)
+                # Count the open socket
+                metrics.SOCKETS_OPEN.inc(path)
+                DRAINER.open()
 
                 try:
-                    # Call the function
-                    await function(**parameters)
+                    # Wait for the function to return, for the client to disconnect or for the worker to drain
+                    await asyncio.wait([watcher, handler, drainer], return_when=asyncio.FIRST_COMPLETED)
+
+                    # Tell the client to reconnect if the worker is draining
+                    if drainer.done():
+                        code = CODE_RECONNECT
+
+                    # Cancel the function if the client disconnected, so that subscriptions are torn down immediately
+                    handler.cancel()
+
+                    # Wait for the function to finish
+                    await asyncio.wait([handler])
+
+                    # Raise function failures
+                    if not handler.cancelled():
+                        handler.result()
+                except WebSocketDisconnect as exception:
+                    # Close the websocket using the disconnection code
+                    code = exception.code
                 finally:
-                    # Close the websocket
-                    await websocket.close()
+                    # Check whether the client disconnected
+                    disconnected = watcher.done()
+
+                    # Stop the watcher, the function and the drain waiter
+                    watcher.cancel()
+                    handler.cancel()
+                    drainer.cancel()
+
+                    # Close the websocket if the client is still connected, reconnecting clients are given the jitter window
+                    if not disconnected:
+                        with contextlib.suppress(RuntimeError):
+                            await websocket.close(code, str(int(SOCKET_RECONNECT_JITTER * 1000)) if code == CODE_RECONNECT else None)
+
+                    # Stop the sender, which is left running if the client disconnected
+                    if queue is not None:
+                        queue.stop()
+
+                    # Count the closed socket
+                    metrics.SOCKETS_OPEN.dec(path)
+                    DRAINER.close()
 
             # Append the route
             self.routes.append(WebSocketRoute(path, endpoint=endpoint, name=function.__name__))
@@ -138,39 +1001,114 @@ class Router:
         # Return the decorator
         return decorator
 
-    def route(self, methods: typing.List[str], /, path: str, cast: bool = False, check: bool = True) -> typing.Callable[[Function], Function]:
+    def route(self, methods: typing.List[str], /, path: str, cast: bool = False, check: bool = True, max_body_size: int = MAX_BODY_SIZE, threaded: bool = True, cache: typing.Optional[Cache] = None, profile: bool = False) -> typing.Callable[[Function], Function]:
         # Create a decorator function
         def decorator(function: Function) -> Function:
+            # Compile the parameter parser
+            parser = Parser(function, cast, check)
+
+            # Check whether the function is a coroutine function
+            coroutine = inspect.iscoroutinefunction(function)
+
+            # Resolve the path parameter names
+            _, _, path_convertors = compile_path(path)
+
+            # Check whether the function requires parameters other than the path parameters
+            gather = parser.variable or not parser.names.issubset(path_convertors)
+
+            # Resolve the names to gather - functions with variable keyword parameters require all parameters
+            names = None if parser.variable else parser.names
 
             # Create the request endpoint function
             async def endpoint(request: Request) -> Response:
-                # Create a dictionary to store all of the paremters
-                parameters = await gather_parameters(request)
+                # Functions that only require path parameters skip reading the query and the body entirely
+                if not gather:
+                    gathered = dict(request.path_params)
+                else:
+                    # Gather the parameters, reading at most the maximal body size
+                    gathered = await gather_parameters(request, names, max_body_size)
 
-                # Process the parameters
-                if cast:
-                    # Cast all parameters and overwrite the parameters dictionary
-                    parameters = cast_type_hints(function, [], parameters)
+                # Mark the gathering phase
+                mark("gather")
 
-                if check:
-                    # Check all the parameters against the types
-                    check_type_hints(function, [], parameters)
+                # Select the codec the client accepts
+                codec = negotiate(request.headers.get(HEADER_ACCEPT))
 
-                # Call the function
-                if inspect.iscoroutinefunction(function):
-                    result = await function(**parameters)
-                else:
-                    result = function(**parameters)
+                try:
+                    # Cast and check the parameters using the precompiled parser
+                    parameters = parser.parse(gathered)
+
+                    # Mark the parsing phase - casting and checking
+                    mark("parse")
+
+                    if cache is not None:
+                        # Create the cache key from the codec and the parameters
+                        key: typing.Any = (codec.name, tuple(sorted(parameters.items())))
+
+                        # Skip caching for unhashable parameters
+                        try:
+                            hash(key)
+                        except TypeError:
+                            key = None
+
+                        # Respond using cached entries
+                        if key is not None and (entry := cache.get(key)) is not MISSING:
+                            return cached_response(request, *entry)
+
+                        # Store the generation before calling the function
+                        generation = cache.generation
+
+                    # Call the function - synchronous functions are called in the thread pool unless disabled
+                    if coroutine:
+                        result = await profiled_await(function(**parameters))
+                    elif threaded:
+                        result = await self.pool.run(function, parameters)
+                    else:
+                        result = profiled_call(function, parameters)
+
+                    # Mark the function phase
+                    mark("handler")
+                finally:
+                    # Close uploaded files once the function returns
+                    await close_uploads(gathered)
 
                 # Check if the result is a response
                 if isinstance(result, Response):
                     return result
 
-                # Return a JSON response
-                return JSONResponse(result)
+                # Cache the encoded result as needed
+                if cache is not None and key is not None:
+                    # Encode the result once
+                    content = codec.dumps(result)
+
+                    # Create the cache entry - content, media type, strong entity tag and modification time
+                    entry = (content, codec.media_type, '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"', time.time())
+
+                    # Store the entry
+                    cache.set(key, entry, generation)
+
+                    # Respond using the new entry
+                    return cached_response(request, *entry)
+
+                # Return an encoded response, using the codec the client accepts
+                return EncodedResponse(result, codec=codec)
+
+            # Create the route application
+            application = endpoint
+
+            # Profile requests as needed
+            if profile or PROFILE_RATE > 0:
+                application = profile_endpoint(path, application, profile)
+
+            # Measure requests as needed
+            if metrics.METRICS:
+                application = measure_endpoint(path, application)
+
+            # Update whether any route is always profiled
+            self.profiled = self.profiled or profile
 
             # Append the route
-            self.routes.append(Route(path, endpoint=endpoint, methods=methods, name=function.__name__ + repr(methods)))
+            self.routes.append(Route(path, endpoint=application, methods=methods, name=function.__name__ + repr(methods)))
 
             # Return the original function
             return typing.cast(Function, function)
@@ -178,17 +1116,65 @@ class Router:
         # Return the decorator
         return decorator
 
-    def get(self, path: str, /, cast: bool = True, check: bool = True) -> typing.Callable[[Function], Function]:
-        return self.route(["GET"], path=path, cast=cast, check=check)
+    def get(self, path: str, /, cast: bool = True, check: bool = True, max_body_size: int = MAX_BODY_SIZE, threaded: bool = True, cache: typing.Optional[Cache] = None, profile: bool = False) -> typing.Callable[[Function], Function]:
+        return self.route(["GET"], path=path, cast=cast, check=check, max_body_size=max_body_size, threaded=threaded, cache=cache, profile=profile)
 
-    def post(self, path: str, /, cast: bool = False, check: bool = True) -> typing.Callable[[Function], Function]:
-        return self.route(["POST"], path=path, cast=cast, check=check)
+    def post(self, path: str, /, cast: bool = False, check: bool = True, max_body_size: int = MAX_BODY_SIZE, threaded: bool = True, profile: bool = False) -> typing.Callable[[Function], Function]:
+        return self.route(["POST"], path=path, cast=cast, check=check, max_body_size=max_body_size, threaded=threaded, profile=profile)
 
-    def put(self, path: str, /, cast: bool = False, check: bool = True) -> typing.Callable[[Function], Function]:
-        return self.route(["PUT"], path=path, cast=cast, check=check)
+    def put(self, path: str, /, cast: bool = False, check: bool = True, max_body_size: int = MAX_BODY_SIZE, threaded: bool = True, profile: bool = False) -> typing.Callable[[Function], Function]:
+        return self.route(["PUT"], path=path, cast=cast, check=check, max_body_size=max_body_size, threaded=threaded, profile=profile)
 
-    def delete(self, path: str, /, cast: bool = False, check: bool = True) -> typing.Callable[[Function], Function]:
-        return self.route(["DELETE"], path=path, cast=cast, check=check)
+    def delete(self, path: str, /, cast: bool = False, check: bool = True, max_body_size: int = MAX_BODY_SIZE, threaded: bool = True, profile: bool = False) -> typing.Callable[[Function], Function]:
+        return self.route(["DELETE"], path=path, cast=cast, check=check, max_body_size=max_body_size, threaded=threaded, profile=profile)
+
+    def startup(self, function: Function) -> Function:
+        # Run the function in every worker, before it starts serving
+        self.startups.append(function)
+
+        # Return the original function
+        return function
+
+    def shutdown(self, function: Function) -> Function:
+        # Run the function in every worker, after it stops serving
+        self.shutdowns.append(function)
+
+        # Return the original function
+        return function
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, application: Starlette) -> typing.AsyncIterator[None]:
+        # Run the startup hooks in order, failures stop the worker
+        for function in self.startups:
+            await call_hook(function)
+
+        # Start publishing the metrics of this worker
+        metrics.start()
+
+        # Mark the worker as ready
+        self.ready = True
+
+        try:
+            # Serve requests
+            yield
+        finally:
+            # Mark the worker as not ready
+            self.ready = False
+
+            # Run the shutdown hooks in reverse order, so that resources are released after their users
+            for function in reversed(self.shutdowns):
+                try:
+                    await call_hook(function)
+                except Exception as exception:  # pylint: disable=broad-exception-caught
+                    logging.warning("Shutdown hook %s failed: %r", function.__name__, exception)
+
+    async def ready_endpoint(self, request: Request) -> Response:
+        # Workers are ready once started, until they drain
+        if not self.ready or DRAINER.draining:
+            return PlainTextResponse("Not Ready", status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        # The worker is ready
+        return PlainTextResponse("Ready")
 
     def __call__(self) -> Starlette:
         # Create exception handler
@@ -202,17 +1188,31 @@ class Router:
         # Generate a list of routes
         routes = list(self.routes)
 
+        # Create the readiness route
+        routes.append(Route(READY_PATH, endpoint=self.ready_endpoint, methods=["GET"], name="ready"))
+
+        # Create the metrics route as needed
+        if metrics.METRICS:
+            routes.append(Route(metrics.METRICS_PATH, endpoint=metrics_endpoint, methods=["GET"], name="metrics"))
+
+        # Create the profiling dump route as needed - only when a token protects it
+        if (PROFILE_RATE > 0 or self.profiled) and PROFILE_TOKEN:
+            routes.append(Route(PROFILE_PATH, endpoint=profile_dump_endpoint, methods=["GET"], name="profile"))
+
         # Create the static files route as needed
         if self.root is not None:
             # This route should be last as it is a fallback route
-            routes.append(Mount(path="/", app=StaticFiles(directory=self.root, html=True)))
+            routes.append(Mount(path="/", app=MemoryStaticFiles(directory=self.root) if STATIC_MEMORY else StaticFiles(directory=self.root, html=True)))
+
+        # Compress responses as needed
+        middleware = [Middleware(CompressionMiddleware, counters=self.compressed)] if COMPRESSION else []
 
         # Initialize the starlette application
-        return Starlette(debug=DEBUG, routes=routes, exception_handlers=exception_handlers)
+        return Starlette(debug=DEBUG, routes=routes, middleware=middleware, exception_handlers=exception_handlers, lifespan=self.lifespan)
 
 
 # Initialize the router
 router = Router("../frontend")
 
 # Add explicit exports
-__all__ = ["WebSocket", "Request", "Response", "PlainTextResponse", "JSONResponse", "UploadFile", "router"]
+__all__ = ["WebSocket", "Request", "Response", "PlainTextResponse", "JSONResponse", "EncodedResponse", "UploadFile", "router"]
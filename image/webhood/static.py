@@ -0,0 +1,218 @@
+import os
+import re
+import gzip
+import time
+import typing
+import asyncio
+import hashlib
+import mimetypes
+import email.utils
+
+# Import starlette utilities
+from starlette import status
+from starlette.types import Receive, Scope, Send
+from starlette.datastructures import Headers
+from starlette.responses import Response, PlainTextResponse, RedirectResponse
+
+# Import debug utilities
+from webhood.constants import DEBUG
+
+# Import compression utilities
+from webhood.compression import ENCODING_BROTLI, ENCODING_GZIP, ENCODING_IDENTITY, HEADER_ETAG, HEADER_CONTENT_LENGTH, HEADER_CONTENT_ENCODING, HEADER_ACCEPT_ENCODING, brotli, is_compressible, select_encoding
+
+# Headers for static file serving
+HEADER_VARY = "Vary"
+HEADER_LAST_MODIFIED = "Last-Modified"
+HEADER_CACHE_CONTROL = "Cache-Control"
+HEADER_IF_NONE_MATCH = "If-None-Match"
+
+# Cache policies - hashed assets never change, other files are always revalidated
+CACHE_CONTROL_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_CONTROL_REVALIDATE = "no-cache"
+
+# Pattern of hashed asset names (e.g. application.3f2a9c1b.js)
+PATTERN_HASHED = re.compile(r"[.-][0-9a-fA-F]{8,}\.[^./]+$")
+
+# Index and error pages
+INDEX_FILE = "index.html"
+ERROR_FILE = "404.html"
+
+# Minimal file size to compress
+STATIC_COMPRESS_SIZE = int(os.environ.get("STATIC_COMPRESS_SIZE", 256))
+
+# Whether to reload changed files and how often to check for changes - enabled in debug mode by default
+STATIC_WATCH = bool(int(os.environ.get("STATIC_WATCH", int(DEBUG))))
+STATIC_WATCH_INTERVAL = float(os.environ.get("STATIC_WATCH_INTERVAL", 1))
+
+
+class StaticFile:
+
+    def __init__(self, name: str, content: bytes, modified: float) -> None:
+        # Store the file modification time
+        self.modified = modified
+
+        # Resolve the media type
+        self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+        # Resolve the cache policy
+        self.cache_control = CACHE_CONTROL_IMMUTABLE if PATTERN_HASHED.search(name) else CACHE_CONTROL_REVALIDATE
+
+        # Create the content digest for entity tags
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+
+        # Initialize the variants - content and entity tag of every encoding
+        self.variants: typing.Dict[str, typing.Tuple[bytes, str]] = {ENCODING_IDENTITY: (content, f'"{digest}"')}
+
+        # Initialize the compressed encodings, ordered by preference
+        self.encodings: typing.List[str] = []
+
+        # Only compress compressible files that are large enough
+        if len(content) < STATIC_COMPRESS_SIZE or not is_compressible(self.media_type):
+            return
+
+        # Precompute the compressed variants
+        compressors: typing.Dict[str, typing.Callable[[bytes], bytes]] = {ENCODING_GZIP: lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressors[ENCODING_BROTLI] = lambda data: brotli.compress(data, quality=11)
+
+        for encoding, compress in compressors.items():
+            # Compress the content
+            compressed = compress(content)
+
+            # Keep only variants that are smaller than the content
+            if len(compressed) < len(content):
+                self.variants[encoding] = (compressed, f'"{digest}-{encoding}"')
+
+        # Store the compressed encodings, ordered by preference
+        self.encodings = [encoding for encoding in (ENCODING_BROTLI, ENCODING_GZIP) if encoding in self.variants]
+
+    def respond(self, headers: Headers, method: str, status_code: int = status.HTTP_200_OK) -> Response:
+        # Select the variant the client accepts
+        encoding = select_encoding(headers.get(HEADER_ACCEPT_ENCODING, ""), self.encodings)
+        content, etag = self.variants[encoding]
+
+        # Create the response headers
+        response_headers = {
+            HEADER_ETAG: etag,
+            HEADER_VARY: HEADER_ACCEPT_ENCODING,
+            HEADER_CACHE_CONTROL: self.cache_control,
+            HEADER_LAST_MODIFIED: email.utils.formatdate(self.modified, usegmt=True),
+        }
+
+        # Add the content encoding of compressed variants
+        if encoding != ENCODING_IDENTITY:
+            response_headers[HEADER_CONTENT_ENCODING] = encoding
+
+        # Parse the entity tags the client already has
+        tags = [tag.strip() for tag in headers.get(HEADER_IF_NONE_MATCH, "").split(",")]
+
+        # Respond without content if the client already has it, ignoring weak prefixes
+        if status_code == status.HTTP_200_OK and etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+
+        # Add the content length, since HEAD responses have no content
+        response_headers[HEADER_CONTENT_LENGTH] = str(len(content))
+
+        # Respond with the content
+        return Response(content if method != "HEAD" else b"", status_code, response_headers, self.media_type)
+
+
+class MemoryStaticFiles:
+
+    def __init__(self, directory: str, watch: bool = STATIC_WATCH) -> None:
+        # Store the directory and the watch configuration
+        self.directory = directory
+        self.watch = watch
+
+        # Initialize the files, keyed by their relative path
+        self.files: typing.Dict[str, StaticFile] = {}
+
+        # Initialize the last scan time and whether a reload is running
+        self.scanned = 0.0
+        self.reloading = False
+
+        # Load the directory tree into memory
+        self.load()
+
+    def load(self) -> None:
+        # Create the new files dictionary
+        files: typing.Dict[str, StaticFile] = {}
+
+        # Resolve the root directory, so that symbolic links can be checked against it
+        root = os.path.realpath(self.directory)
+
+        # Walk the directory tree, without following symbolic links to directories
+        for directory, _, names in os.walk(self.directory):
+            for name in names:
+                # Resolve the file paths
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+                # Skip symbolic links to files outside of the root directory, like starlette does
+                if os.path.commonpath([root, os.path.realpath(path)]) != root:
+                    continue
+
+                # Fetch the file modification time
+                modified = os.stat(path).st_mtime
+
+                # Keep unchanged files
+                static_file = self.files.get(relative_path)
+                if static_file is None or static_file.modified != modified:
+                    # Read the file contents
+                    with open(path, "rb") as file:
+                        static_file = StaticFile(name, file.read(), modified)
+
+                # Store the file
+                files[relative_path] = static_file
+
+        # Replace the files
+        self.files = files
+
+        # Update the last scan time
+        self.scanned = time.monotonic()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Reload changed files as needed, in a thread since compressing files blocks
+        if self.watch and not self.reloading and time.monotonic() - self.scanned > STATIC_WATCH_INTERVAL:
+            self.reloading = True
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.load)
+            finally:
+                self.reloading = False
+
+        # Create the response
+        response = self.lookup(scope["path"], Headers(scope=scope), scope["method"])
+
+        # Send the response
+        await response(scope, receive, send)
+
+    def lookup(self, path: str, headers: Headers, method: str) -> Response:
+        # Only reading methods are allowed
+        if method not in ("GET", "HEAD"):
+            return PlainTextResponse("Method Not Allowed", status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        # Resolve the relative path
+        relative_path = path.lstrip("/")
+
+        # Directories are served using their index file
+        if not relative_path or relative_path.endswith("/"):
+            relative_path += INDEX_FILE
+
+        # Serve the file if it exists
+        if relative_path in self.files:
+            return self.files[relative_path].respond(headers, method)
+
+        # Redirect directories with index files to their trailing slash path
+        if relative_path + "/" + INDEX_FILE in self.files:
+            return RedirectResponse(path + "/")
+
+        # Serve the error page if it exists
+        if ERROR_FILE in self.files:
+            return self.files[ERROR_FILE].respond(headers, method, status.HTTP_404_NOT_FOUND)
+
+        # File does not exist
+        return PlainTextResponse("Not Found", status.HTTP_404_NOT_FOUND)
+
+
+# Add explicit exports
+__all__ = ["StaticFile", "MemoryStaticFiles"]
@@ -0,0 +1,352 @@
+import os
+import abc
+import time
+import random
+import typing
+import asyncio
+import inspect
+import logging
+import functools
+import contextlib
+import concurrent.futures
+
+# Import redis utilities
+import redis
+
+# Import database utilities
+from webhood.database import receive_async
+
+# Import job queue utilities
+from webhood.jobs import JOB_CONCURRENCY, JOB_RETRIES, JOB_VISIBILITY_TIMEOUT, Job, Queue
+
+# Import metrics utilities
+from webhood import metrics
+
+# Number of processes for CPU-bound tasks - 0 disables the process pool
+TASK_PROCESSES = int(os.environ.get("TASK_PROCESSES", 0))
+
+# Default fraction of the interval to randomize periodic schedules by, so that workers do not run tasks all at once
+TASK_JITTER = float(os.environ.get("TASK_JITTER", 0.1))
+
+# Maximal time for running tasks to finish once the worker stops
+TASK_SHUTDOWN_TIMEOUT = float(os.environ.get("TASK_SHUTDOWN_TIMEOUT", 30))
+
+# Maximal number of concurrent and queued runs per event task - further events wait for a free slot
+TASK_EVENT_CONCURRENCY = int(os.environ.get("TASK_EVENT_CONCURRENCY", 16))
+
+# Task run results
+RESULT_SUCCESS = "success"
+RESULT_FAILURE = "failure"
+RESULT_SKIPPED = "skipped"
+
+# Function type for decorators
+Function = typing.TypeVar("Function", bound=typing.Callable[..., typing.Any])
+
+
+class Task(abc.ABC):
+
+    def __init__(self, function: typing.Callable[..., typing.Any], overlap: bool, process: bool) -> None:
+        # Make sure only synchronous functions run in the process pool
+        assert not (process and inspect.iscoroutinefunction(function)), "Process tasks must be synchronous"
+
+        # Store the function and its name
+        self.function = function
+        self.name = function.__name__
+
+        # Store the execution configuration
+        self.overlap = overlap
+        self.process = process
+
+        # The lock that prevents overlapping runs is created lazily, inside the running event loop
+        self._lock: typing.Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        # Create the lock on first use, since tasks are registered at import time, before the event loop exists
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # Return the lock
+        return self._lock
+
+    async def execute(self, executor: typing.Optional[concurrent.futures.Executor], *arguments: typing.Any) -> bool:
+        # Run without the lock if overlapping runs are allowed
+        if self.overlap:
+            return await self.run(executor, *arguments)
+
+        # Run with the lock otherwise
+        async with self.lock:
+            return await self.run(executor, *arguments)
+
+    async def run(self, executor: typing.Optional[concurrent.futures.Executor], *arguments: typing.Any) -> bool:
+        # Store the start time
+        started = time.perf_counter()
+
+        try:
+            if inspect.iscoroutinefunction(self.function):
+                # Await coroutine functions on the event loop
+                await self.function(*arguments)
+            else:
+                # Run synchronous functions in the process pool or in a thread, so that the event loop is not blocked
+                await asyncio.get_running_loop().run_in_executor(executor if self.process else None, functools.partial(self.function, *arguments))
+
+            # The run succeeded
+            result = RESULT_SUCCESS
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Log the failure, the task keeps running
+            logging.exception("Task %s failed", self.name)
+
+            # The run failed
+            result = RESULT_FAILURE
+
+        # Update the task metrics
+        metrics.TASK_DURATION.observe(time.perf_counter() - started, self.name)
+        metrics.TASK_RUNS.inc(self.name, result)
+
+        # Return whether the run succeeded
+        return result == RESULT_SUCCESS
+
+    @abc.abstractmethod
+    async def schedule(self, scheduler: "Scheduler") -> None:
+        pass
+
+
+class PeriodicTask(Task):
+
+    def __init__(self, function: typing.Callable[..., typing.Any], interval: float, jitter: float, overlap: bool, process: bool) -> None:
+        # Initialize the task
+        super().__init__(function, overlap, process)
+
+        # Store the schedule
+        self.interval = interval
+        self.jitter = jitter
+
+    async def schedule(self, scheduler: "Scheduler") -> None:
+        # Wait a random part of the jitter window before the first run, so that workers that start together do not run together
+        await asyncio.sleep(random.uniform(0, self.interval * self.jitter))
+
+        while True:
+            # Skip the run if the previous run did not finish yet
+            if not self.overlap and self.lock.locked():
+                metrics.TASK_RUNS.inc(self.name, RESULT_SKIPPED)
+            else:
+                scheduler.spawn(self.execute(scheduler.executor))
+
+            # Wait for the next run, randomized within the jitter window
+            await asyncio.sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+class EventTask(Task):
+
+    def __init__(self, function: typing.Callable[..., typing.Any], channel: str, concurrency: int, overlap: bool, process: bool) -> None:
+        # Initialize the task
+        super().__init__(function, overlap, process)
+
+        # Store the channel and the concurrency limit
+        self.channel = channel
+        self.concurrency = concurrency
+
+    async def handle(self, scheduler: "Scheduler", slots: asyncio.Semaphore, event: typing.Any) -> None:
+        try:
+            # Run the function
+            await self.execute(scheduler.executor, event)
+        finally:
+            # Free the slot of the run
+            slots.release()
+
+    async def schedule(self, scheduler: "Scheduler") -> None:
+        # Create the slots of concurrent and queued runs inside the running event loop
+        slots = asyncio.Semaphore(self.concurrency)
+
+        # Run the function for every message, runs are queued in order unless overlapping runs are allowed
+        async for event in receive_async(self.channel):
+            # Wait for a free slot, so that a burst of events does not create unbounded runs
+            await slots.acquire()
+
+            # Start the run
+            scheduler.spawn(self.handle(scheduler, slots, event))
+
+
+class JobTask(Task):
+
+    def __init__(self, function: typing.Callable[..., typing.Any], queue: Queue, concurrency: int, process: bool) -> None:
+        # Initialize the task, jobs run concurrently
+        super().__init__(function, True, process)
+
+        # Store the queue and the concurrency limit
+        self.queue = queue
+        self.concurrency = concurrency
+
+        # Initialize the running jobs
+        self.jobs: typing.Set[asyncio.Future] = set()
+
+    async def handle(self, scheduler: "Scheduler", job: Job) -> None:
+        # Keep the job claimed while it runs
+        heartbeat = asyncio.ensure_future(self.heartbeat(job))
+
+        try:
+            # Run the function
+            succeeded = await self.execute(scheduler.executor, job.message)
+        finally:
+            # Stop the heartbeat
+            heartbeat.cancel()
+
+        # Acknowledge or retry the job
+        if succeeded:
+            await self.queue.complete(job)
+        else:
+            await self.queue.fail(job)
+
+    async def heartbeat(self, job: Job) -> None:
+        while True:
+            # Wait for a part of the visibility timeout
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+
+            # Reset the idle time of the job, ignoring temporary failures
+            with contextlib.suppress(Exception):
+                await self.queue.heartbeat(job)
+
+    def start(self, scheduler: "Scheduler", job: Job) -> None:
+        # Process the job and keep track of it
+        future = asyncio.ensure_future(self.handle(scheduler, job))
+        self.jobs.add(future)
+        future.add_done_callback(self.jobs.discard)
+        scheduler.track(future)
+
+    async def schedule(self, scheduler: "Scheduler") -> None:
+        # Create the consumer group
+        await self.queue.create()
+
+        # Initialize the last maintenance time
+        maintained = 0.0
+
+        while True:
+            try:
+                # Promote delayed jobs, take over the jobs of unresponsive workers and measure the queue about once a second
+                if time.monotonic() - maintained > 1:
+                    await self.queue.promote()
+                    await self.queue.reclaim()
+                    await self.queue.measure()
+                    maintained = time.monotonic()
+
+                # Wait for a free slot
+                if len(self.jobs) >= self.concurrency:
+                    await asyncio.wait(self.jobs, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                # Read new jobs for the free slots and process them
+                for job in await self.queue.read(self.concurrency - len(self.jobs)):
+                    self.start(scheduler, job)
+            except (redis.ConnectionError, redis.TimeoutError) as exception:
+                # Wait for the database to recover
+                logging.warning("Job queue %s failed: %r", self.queue.name, exception)
+                await asyncio.sleep(1)
+            except redis.ResponseError as exception:
+                # Log the failure, which is usually a missing consumer group after the stream was deleted
+                logging.warning("Job queue %s failed: %r", self.queue.name, exception)
+                await asyncio.sleep(1)
+
+                # Recreate the consumer group, ignoring temporary failures
+                with contextlib.suppress(redis.RedisError):
+                    await self.queue.create()
+
+
+class Scheduler:
+
+    def __init__(self, processes: int = TASK_PROCESSES) -> None:
+        # Store the process pool size
+        self.processes = processes
+
+        # Initialize the registered tasks
+        self.tasks: typing.List[Task] = []
+
+        # Initialize the process pool and the running task executions
+        self.executor: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.running: typing.Set[asyncio.Future] = set()
+
+    def periodic(self, interval: float, /, jitter: float = TASK_JITTER, overlap: bool = False, process: bool = False) -> typing.Callable[[Function], Function]:
+        # Create a decorator function
+        def decorator(function: Function) -> Function:
+            # Register the task
+            self.tasks.append(PeriodicTask(function, interval, jitter, overlap, process))
+
+            # Return the original function
+            return function
+
+        # Return the decorator
+        return decorator
+
+    def event(self, channel: str, /, concurrency: int = TASK_EVENT_CONCURRENCY, overlap: bool = False, process: bool = False) -> typing.Callable[[Function], Function]:
+        # Create a decorator function
+        def decorator(function: Function) -> Function:
+            # Register the task
+            self.tasks.append(EventTask(function, channel, concurrency, overlap, process))
+
+            # Return the original function
+            return function
+
+        # Return the decorator
+        return decorator
+
+    def job(self, queue: str, /, concurrency: int = JOB_CONCURRENCY, retries: int = JOB_RETRIES, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT, process: bool = False) -> typing.Callable[[Function], Function]:
+        # Create a decorator function
+        def decorator(function: Function) -> Function:
+            # Register the task
+            self.tasks.append(JobTask(function, Queue(queue, retries=retries, visibility_timeout=visibility_timeout), concurrency, process))
+
+            # Return the original function
+            return function
+
+        # Return the decorator
+        return decorator
+
+    def track(self, future: asyncio.Future) -> None:
+        # Keep track of the future until it finishes
+        self.running.add(future)
+        future.add_done_callback(self.running.discard)
+
+    def spawn(self, coroutine: typing.Awaitable[None]) -> None:
+        # Start the task execution and keep track of it
+        self.track(asyncio.ensure_future(coroutine))
+
+    async def run(self) -> None:
+        # Create the process pool if any task requires it
+        if self.processes > 0 and any(task.process for task in self.tasks):
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.processes)
+
+        # Start publishing the metrics of this worker
+        metrics.start()
+
+        # Start the schedules of all tasks
+        schedules = [asyncio.ensure_future(task.schedule(self)) for task in self.tasks]
+
+        try:
+            # Run until cancelled
+            await asyncio.gather(*schedules)
+        finally:
+            # Stop scheduling new runs
+            for schedule in schedules:
+                schedule.cancel()
+
+            # Wait for the running tasks to finish
+            if self.running:
+                await asyncio.wait(self.running, timeout=TASK_SHUTDOWN_TIMEOUT)
+
+            # Cancel whatever did not finish in time - this also cancels their calls that are still pending in the process pool
+            for future in self.running:
+                future.cancel()
+
+            # Let the cancellations reach the process pool
+            await asyncio.sleep(0)
+
+            # Stop the process pool without waiting for calls that already started
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+
+
+# Initialize the scheduler
+scheduler = Scheduler()
+
+# Add explicit exports
+__all__ = ["Task", "PeriodicTask", "EventTask", "JobTask", "Scheduler", "scheduler"]
@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+import timeit
+import argparse
+
+# Append the image directory to the Python PATH
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "image"))
+
+# Import codec utilities
+# pylint: disable-next=wrong-import-position
+from webhood.codecs import CODECS
+
+# Sample message, similar to a typical broadcast
+MESSAGE = {"text": "Hello there, this is a relayed message (someone@example.com)", "timestamp": 1700000000, "index": 12345, "tags": ["relay", "global"], "sender": {"name": "Someone", "verified": True}}
+
+
+def measure(function, iterations: int) -> float:
+    # Return the time per call in microseconds
+    return min(timeit.repeat(function, number=iterations, repeat=5)) / iterations * 1000000
+
+
+def main() -> None:
+    # Create argument parser
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000, help="Number of messages to encode and decode per measurement")
+
+    # Parse the arguments
+    arguments = parser.parse_args()
+
+    # Create the results dictionary
+    results = {}
+
+    # Loop over all available codecs
+    for name, codec in CODECS.items():
+        # Encode the message once for decoding
+        data = codec.dumps(MESSAGE)
+
+        # Measure encoding and decoding
+        results[name] = {
+            "size": len(data),
+            "encode_us": measure(lambda codec=codec: codec.dumps(MESSAGE), arguments.iterations),
+            "decode_us": measure(lambda codec=codec, data=data: codec.loads(data), arguments.iterations),
+        }
+
+    # Write the results to stdout
+    json.dump(results, sys.stdout, indent=4)
+
+
+if __name__ == "__main__":
+    main()
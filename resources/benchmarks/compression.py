@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import timeit
+import argparse
+
+# Append the image directory to the Python PATH
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "image"))
+
+# Import compression utilities
+# pylint: disable-next=wrong-import-position
+from webhood.compression import ENCODING_BROTLI, ENCODING_GZIP, Compressor, brotli
+
+# Sample post, similar to the wall example
+POST = {"id": "3f2a9c1b5e7d4a60", "author": "Someone", "text": "Hello there, this is a post on the wall", "timestamp": 1700000000}
+
+
+def measure(function, iterations: int) -> float:
+    # Return the time per call in microseconds
+    return min(timeit.repeat(function, number=iterations, repeat=5)) / iterations * 1000000
+
+
+def main() -> None:
+    # Create argument parser
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1000, help="Number of payloads to compress per measurement")
+    parser.add_argument("--bandwidth", type=float, default=10, help="Client bandwidth in megabits per second, used to estimate the transfer time saved")
+
+    # Parse the arguments
+    arguments = parser.parse_args()
+
+    # Resolve the available encodings
+    encodings = [ENCODING_GZIP] + ([ENCODING_BROTLI] if brotli is not None else [])
+
+    # Create the results dictionary
+    results = {}
+
+    # Loop over payloads of increasing sizes
+    for count in (1, 4, 16, 64, 256, 1024):
+        # Create the payload
+        payload = json.dumps([POST] * count).encode()
+
+        # Loop over all available encodings
+        for encoding in encodings:
+            # Compress the payload once for the size
+            compressed = Compressor(encoding).compress(payload, True)
+
+            # Measure the compression time
+            compress_us = measure(lambda encoding=encoding, payload=payload: Compressor(encoding).compress(payload, True), arguments.iterations)
+
+            # Estimate the transfer time saved by the compression
+            saved_us = (len(payload) - len(compressed)) * 8 / arguments.bandwidth
+
+            # Store the measurement - compression helps when the transfer time saved exceeds the compression time
+            results[f"{encoding}-{len(payload)}"] = {
+                "size": len(payload),
+                "compressed_size": len(compressed),
+                "ratio": len(compressed) / len(payload),
+                "compress_us": compress_us,
+                "saved_us": saved_us,
+                "helps": saved_us > compress_us,
+            }
+
+    # Write the results to stdout
+    json.dump(results, sys.stdout, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+# pylint: disable=import-outside-toplevel
+
+import os
+import sys
+import json
+import time
+import typing
+import asyncio
+import argparse
+import platform
+
+# Append the image directory to the Python PATH
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "image"))
+
+# Channel used for benchmarking
+CHANNEL = "benchmark"
+
+# Sample body, similar to a typical form submission
+BODY = {"name": "Someone", "message": "Hello there, this is a benchmark message", "count": 10}
+
+
+def summarize(latencies, duration: float, count: int = 0) -> dict:
+    # Sort the latencies for percentiles
+    latencies = sorted(latencies)
+
+    # Count one operation per latency by default
+    count = count or len(latencies)
+
+    # Return the throughput and the latency percentiles in microseconds
+    return {
+        "count": count,
+        "per_second": count / duration if duration else 0,
+        "p50_us": latencies[int(0.50 * (len(latencies) - 1))] * 1000000,
+        "p99_us": latencies[int(0.99 * (len(latencies) - 1))] * 1000000,
+        "max_us": latencies[-1] * 1000000,
+    }
+
+
+def use_fake_redis() -> None:
+    # Import the fake clients, only required for in-process benchmarks
+    import fakeredis
+
+    # Import the lazy clients
+    from webhood import database
+
+    # Create the shared in-process server
+    server = fakeredis.FakeServer()
+
+    # Replace the factories of the lazy clients, skipping the network entirely
+    typing.cast(database.LazyRedis, database.REDIS_SYNC).replace(lambda: fakeredis.FakeRedis(server=server, decode_responses=True))
+    typing.cast(database.LazyRedis, database.REDIS_ASYNC).replace(lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    typing.cast(database.LazyRedis, database.REDIS_BINARY_SYNC).replace(lambda: fakeredis.FakeRedis(server=server))
+    typing.cast(database.LazyRedis, database.REDIS_BINARY_ASYNC).replace(lambda: fakeredis.FakeAsyncRedis(server=server))
+
+
+def create_router():
+    # Import the router utilities
+    from webhood.router import Router, WebSocket
+    from webhood.database import fetch_hub
+
+    # Create a router without static files
+    router = Router()
+
+    # Register routes with and without casting and checking
+    for cast, check in ((False, False), (False, True), (True, True)):
+        # Create the route functions
+        async def read_request(name: str, text: str = ""):
+            return {"name": name, "text": text}
+
+        async def write_request(name: str, message: str, count: int = 0):
+            return {"name": name, "message": message, "count": count}
+
+        # Register the routes
+        router.get(f"/get/{int(cast)}{int(check)}", cast=cast, check=check)(read_request)
+        router.post(f"/post/{int(cast)}{int(check)}", cast=cast, check=check)(write_request)
+
+    @router.socket("/fanout")
+    async def fanout_socket(websocket: WebSocket):
+        # Subscribe to the channel before notifying the client
+        queue = await fetch_hub().subscribe(CHANNEL)
+
+        # Accept the connection and notify the client that the subscription is active
+        await websocket.accept()
+        await websocket.send_text("ready")
+
+        try:
+            # Forward all messages to the client
+            while True:
+                event = await queue.get()
+                await websocket.send_text(repr(event["sent"]))
+        finally:
+            # Unsubscribe from the channel
+            fetch_hub().unsubscribe(CHANNEL, queue)
+
+    # Return the application
+    return router()
+
+
+async def request(application, method: str, path: str, query: bytes = b"", body: bytes = b"") -> int:
+    # Create the request scope
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")] if body else [],
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 8080),
+    }
+
+    # Create the message queue of the request
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        # Return the request body, then wait for a disconnection
+        if messages:
+            return messages.pop()
+        await asyncio.Future()
+
+    # Initialize the response status
+    status = 0
+
+    async def send(message):
+        nonlocal status
+
+        # Store the response status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    # Handle the request
+    await application(scope, receive, send)
+
+    # Return the response status
+    return status
+
+
+async def benchmark_router(application, count: int, concurrency: int) -> dict:
+    # Encode the request body
+    body = json.dumps(BODY).encode()
+
+    # Create the results dictionary
+    results = {}
+
+    # Loop over all route variants
+    for cast, check in ((False, False), (False, True), (True, True)):
+        for method, path, query, content in (("GET", f"/get/{int(cast)}{int(check)}", b"name=Someone&text=Hello", b""), ("POST", f"/post/{int(cast)}{int(check)}", b"", body)):
+            # Initialize the latencies
+            latencies = []
+
+            async def worker(amount: int) -> None:
+                for _ in range(amount):
+                    # Measure a single request
+                    started = time.perf_counter()
+                    status = await request(application, method, path, query, content)
+                    latencies.append(time.perf_counter() - started)
+
+                    # Make sure the request succeeded
+                    assert status == 200, f"{method} {path} failed with {status}"
+
+            # Run the concurrent workers
+            started = time.perf_counter()
+            await asyncio.gather(*[worker(count // concurrency) for _ in range(concurrency)])
+
+            # Store the results
+            results[f"{method.lower()}{'_cast' if cast else ''}{'_check' if check else ''}"] = summarize(latencies, time.perf_counter() - started)
+
+    # Return the results
+    return results
+
+
+async def benchmark_broadcast(count: int, batch_size: int) -> dict:
+    # Import the broadcasting utilities
+    from webhood.database import Batcher, broadcast_async, broadcast_batch_async
+
+    # Create the results dictionary
+    results = {}
+
+    # Measure sequential broadcasts
+    latencies = []
+    started = time.perf_counter()
+    for index in range(count):
+        sent = time.perf_counter()
+        await broadcast_async(CHANNEL, index=index, sent=sent)
+        latencies.append(time.perf_counter() - sent)
+    results["sequential"] = summarize(latencies, time.perf_counter() - started)
+
+    # Measure batch broadcasts, the latencies are per batch
+    latencies = []
+    started = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        sent = time.perf_counter()
+        await broadcast_batch_async([{"index": index, "sent": sent} for index in range(offset, min(offset + batch_size, count))], CHANNEL)
+        latencies.append(time.perf_counter() - sent)
+    results["batch"] = summarize(latencies, time.perf_counter() - started, count)
+
+    # Measure coalesced concurrent broadcasts
+    batcher = Batcher()
+    latencies = []
+
+    async def broadcast(index: int) -> None:
+        sent = time.perf_counter()
+        await batcher.broadcast(CHANNEL, index=index, sent=sent)
+        latencies.append(time.perf_counter() - sent)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[broadcast(index) for index in range(count)])
+    results["coalesced"] = summarize(latencies, time.perf_counter() - started)
+
+    # Return the results
+    return results
+
+
+async def benchmark_fanout(application, subscribers: int, count: int) -> dict:
+    # Import the broadcasting utilities
+    from webhood.database import broadcast_async
+
+    # Initialize the delivery latencies and the latencies of the slowest subscriber of every message
+    latencies = []
+    slowest = []
+
+    # Initialize the subscriber state
+    ready = asyncio.Semaphore(0)
+    delivered = asyncio.Event()
+    pending = 0
+    closed = asyncio.Event()
+
+    async def connect() -> None:
+        # Create the socket scope
+        scope = {"type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": "/fanout", "raw_path": b"/fanout", "query_string": b"", "root_path": "", "headers": [], "client": ("127.0.0.1", 12345), "server": ("127.0.0.1", 8080), "subprotocols": []}
+
+        # Initialize whether the connection was requested
+        connected = False
+
+        async def receive():
+            nonlocal connected
+
+            # Request the connection once
+            if not connected:
+                connected = True
+                return {"type": "websocket.connect"}
+
+            # Disconnect once the benchmark is done
+            await closed.wait()
+            return {"type": "websocket.disconnect", "code": 1000}
+
+        async def send(message):
+            nonlocal pending
+
+            # Only handle sent messages
+            if message["type"] != "websocket.send":
+                return
+
+            # Notify the benchmark that the subscriber is ready
+            if message["text"] == "ready":
+                ready.release()
+                return
+
+            # Store the delivery latency
+            latencies.append(time.perf_counter() - float(message["text"]))
+
+            # Notify the benchmark once all subscribers received the message
+            pending -= 1
+            if pending == 0:
+                slowest.append(latencies[-1])
+                delivered.set()
+
+        # Handle the connection
+        await application(scope, receive, send)
+
+    # Connect all of the subscribers
+    connections = [asyncio.ensure_future(connect()) for _ in range(subscribers)]
+    for _ in range(subscribers):
+        await ready.acquire()
+
+    # Publish the messages one by one, waiting for all subscribers to receive every message
+    started = time.perf_counter()
+    for _ in range(count):
+        pending = subscribers
+        delivered.clear()
+        await broadcast_async(CHANNEL, sent=time.perf_counter())
+        await delivered.wait()
+    duration = time.perf_counter() - started
+
+    # Disconnect all of the subscribers
+    closed.set()
+    await asyncio.gather(*connections)
+
+    # Return the results
+    return {"delivery": summarize(latencies, duration), "slowest_subscriber": summarize(slowest, duration)}
+
+
+def benchmark_redict(count: int) -> dict:
+    # Import the database utilities
+    from webhood.database import redict
+
+    # Create the benchmark dictionary
+    dictionary = redict("benchmark")
+    dictionary.clear()
+    dictionary["value"] = 0
+
+    # Create the operations
+    operations = {
+        "set": lambda: dictionary.__setitem__("value", 1),
+        "get": lambda: dictionary["value"],
+        "contains": lambda: "value" in dictionary,
+        "increment": lambda: dictionary.increment("counter"),
+        "set_nested": lambda: dictionary.__setitem__("nested", {"name": "Someone"}),
+        "get_nested": lambda: dictionary["nested"]["name"],
+    }
+
+    # Create the results dictionary
+    results = {}
+
+    # Measure every operation
+    for name, operation in operations.items():
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(count):
+            operation_started = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - operation_started)
+        results[name] = summarize(latencies, time.perf_counter() - started)
+
+    # Clean up the dictionary
+    dictionary.clear()
+
+    # Return the results
+    return results
+
+
+async def benchmark_aredict(count: int) -> dict:
+    # Import the database utilities
+    from webhood.database import aredict
+
+    # Create the benchmark dictionary
+    dictionary = aredict("benchmark")
+    await dictionary.clear()
+    await dictionary.set("value", 0)
+
+    # Create the operations
+    operations = {
+        "set": lambda: dictionary.set("value", 1),
+        "get": lambda: dictionary.get("value"),
+        "contains": lambda: dictionary.contains("value"),
+        "increment": lambda: dictionary.increment("counter"),
+    }
+
+    # Create the results dictionary
+    results = {}
+
+    # Measure every operation
+    for name, operation in operations.items():
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(count):
+            operation_started = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - operation_started)
+        results[name] = summarize(latencies, time.perf_counter() - started)
+
+    # Clean up the dictionary
+    await dictionary.clear()
+
+    # Return the results
+    return results
+
+
+async def benchmark(arguments: argparse.Namespace) -> dict:
+    # Create the application
+    application = create_router()
+
+    # Create the results dictionary
+    results = {}
+
+    # Run the selected benchmarks
+    if "router" in arguments.benchmarks:
+        results["router"] = await benchmark_router(application, arguments.requests, arguments.concurrency)
+    if "broadcast" in arguments.benchmarks:
+        results["broadcast"] = await benchmark_broadcast(arguments.messages, arguments.batch_size)
+    if "fanout" in arguments.benchmarks:
+        results["fanout"] = {str(subscribers): await benchmark_fanout(application, subscribers, arguments.fanout_messages) for subscribers in arguments.subscribers}
+    if "redict" in arguments.benchmarks:
+        results["redict"] = await asyncio.get_running_loop().run_in_executor(None, benchmark_redict, arguments.operations)
+        results["aredict"] = await benchmark_aredict(arguments.operations)
+
+    # Stop background tasks, like metrics publishing
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+
+    # Return the results
+    return results
+
+
+def main() -> None:
+    # Create argument parser
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis", default=os.environ.get("REDIS"), help="Redis URL to benchmark against")
+    parser.add_argument("--fake", action="store_true", help="Benchmark against an in-process fake database (requires fakeredis with lua support)")
+    parser.add_argument("--benchmarks", nargs="+", default=["router", "broadcast", "fanout", "redict"], help="Benchmarks to run")
+    parser.add_argument("--requests", type=int, default=10000, help="Number of requests per route")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of concurrent requests")
+    parser.add_argument("--messages", type=int, default=10000, help="Number of broadcast messages")
+    parser.add_argument("--batch-size", type=int, default=100, help="Number of messages per batch broadcast")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100, 1000], help="Numbers of socket subscribers for fan-out")
+    parser.add_argument("--fanout-messages", type=int, default=100, help="Number of fan-out messages")
+    parser.add_argument("--operations", type=int, default=10000, help="Number of database operations")
+    parser.add_argument("--output", help="File to write the results to, instead of stdout")
+
+    # Parse the arguments
+    arguments = parser.parse_args()
+
+    # Make sure a database is configured
+    if not arguments.fake and not arguments.redis:
+        parser.error("Either --redis, the REDIS environment variable or --fake is required")
+
+    # Configure the database before importing webhood - the fake database still requires a URL
+    os.environ["REDIS"] = arguments.redis or "redis://localhost"
+
+    # Replace the database with an in-process fake as needed
+    if arguments.fake:
+        use_fake_redis()
+
+    # Run the benchmarks
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "redis": "fake" if arguments.fake else "external",
+            "arguments": {key: value for key, value in vars(arguments).items() if key not in ("redis", "output")},
+        },
+        **asyncio.run(benchmark(arguments)),
+    }
+
+    # Write the results
+    if arguments.output:
+        with open(arguments.output, "w") as output:
+            json.dump(results, output, indent=4)
+    else:
+        json.dump(results, sys.stdout, indent=4)
+
+
+if __name__ == "__main__":
+    main()